@@ -0,0 +1,95 @@
+from datetime import date
+import pandas as pd
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+
+from .grilla import GRILLA
+from .models import Persona, Recurso, Turno
+from .config import (ESTADO_PENDIENTE, ESTADO_CONFIRMADO, ESTADO_CANCELADO, ESTADO_ASISTIDO,
+                     TAMANIO_LOTE_ANALITICA)
+
+
+# reportes agregados sobre todo el historial: la base agrupa (selects de Core sobre las columnas necesarias,
+# sin armar objetos del ORM) y pandas combina los grupos de a bloques de TAMANIO_LOTE_ANALITICA filas,
+# asi la memoria depende de la cantidad de grupos y no de la cantidad de turnos
+
+ESTADOS = [ESTADO_PENDIENTE, ESTADO_CONFIRMADO, ESTADO_CANCELADO, ESTADO_ASISTIDO]
+
+
+def _leer_en_bloques(db: Session, consulta):
+    # sin filas read_sql devuelve un bloque vacio con columnas sin tipo, se descarta
+    bloques = pd.read_sql(consulta, db.connection(), chunksize=TAMANIO_LOTE_ANALITICA)
+    return (bloque for bloque in bloques if not bloque.empty)
+
+
+def turnos_por_dia_y_estado(db: Session, desde: date, hasta: date):
+    consulta = select(Turno.fecha, Turno.estado, func.count().label("cantidad")).where(
+        Turno.fecha.between(desde, hasta)
+    ).group_by(Turno.fecha, Turno.estado)
+
+    bloques = [bloque.pivot_table(index="fecha", columns="estado", values="cantidad", aggfunc="sum")
+               for bloque in _leer_en_bloques(db, consulta)]
+    if not bloques:
+        return []
+
+    tabla = pd.concat(bloques).groupby(level=0).sum()
+    tabla = tabla.reindex(columns=ESTADOS, fill_value=0).fillna(0).astype("int64").sort_index()
+    tabla["total"] = tabla.sum(axis=1)
+
+    tabla.index = tabla.index.map(str)
+    return tabla.rename_axis("fecha").reset_index().to_dict("records")
+
+
+def tasa_cancelacion_por_persona(db: Session, desde: date, hasta: date, min_turnos: int = 1, limite: int = 100):
+    # ranking de las personas con mayor proporcion de turnos cancelados en el periodo
+    consulta = select(
+        Turno.persona_id,
+        func.count().label("turnos"),
+        func.sum(case((Turno.estado == ESTADO_CANCELADO, 1), else_=0)).label("cancelados")
+    ).where(
+        Turno.fecha.between(desde, hasta)
+    ).group_by(Turno.persona_id).having(func.count() >= min_turnos)
+
+    # cada bloque se reduce a sus mejores `limite` filas antes de juntarlo con lo acumulado
+    ranking = None
+    for bloque in _leer_en_bloques(db, consulta):
+        bloque["tasa_cancelacion"] = bloque["cancelados"] / bloque["turnos"]
+        if ranking is not None:
+            bloque = pd.concat([ranking, bloque])
+        ranking = bloque.nlargest(limite, ["tasa_cancelacion", "cancelados"])
+
+    if ranking is None or ranking.empty:
+        return []
+
+    personas = db.execute(
+        select(Persona.id, Persona.nombre, Persona.dni).where(Persona.id.in_(ranking["persona_id"].tolist()))
+    ).all()
+    datos_personas = pd.DataFrame(personas, columns=["persona_id", "nombre", "dni"])
+
+    ranking = ranking.merge(datos_personas, on="persona_id", how="left")
+    ranking["tasa_cancelacion"] = ranking["tasa_cancelacion"].round(4)
+    return ranking[["persona_id", "nombre", "dni", "turnos", "cancelados", "tasa_cancelacion"]].to_dict("records")
+
+
+def ocupacion_por_horario(db: Session, desde: date, hasta: date):
+    # por cada horario de la grilla: turnos tomados (no cancelados), cancelados y proporcion ocupada
+    # de los lugares disponibles (dias en que se atiende en ese horario por recursos activos)
+    consulta = select(
+        Turno.hora,
+        func.sum(case((Turno.estado != ESTADO_CANCELADO, 1), else_=0)).label("ocupados"),
+        func.sum(case((Turno.estado == ESTADO_CANCELADO, 1), else_=0)).label("cancelados")
+    ).where(
+        Turno.fecha.between(desde, hasta)
+    ).group_by(Turno.hora)
+
+    bloques = list(_leer_en_bloques(db, consulta))
+    tabla = pd.concat(bloques).groupby("hora")[["ocupados", "cancelados"]].sum() if bloques else pd.DataFrame(columns=["ocupados", "cancelados"])
+
+    # los horarios sin turnos tambien aparecen, con 0
+    tabla = tabla.reindex(list(GRILLA.horas), fill_value=0).fillna(0).astype("int64")
+    recursos = db.execute(select(func.count()).select_from(Recurso).where(Recurso.activo.is_(True))).scalar()
+    lugares = pd.Series(GRILLA.dias_habilitados(desde, hasta), index=tabla.index) * recursos
+    tabla["ocupacion"] = (tabla["ocupados"] / lugares.where(lugares > 0)).fillna(0).round(4)
+
+    tabla.index = [hora.strftime("%H:%M") for hora in tabla.index]
+    return tabla.rename_axis("hora").reset_index().to_dict("records")
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Protocol
+
+
+class BackendCache(Protocol):
+    """Lo minimo que necesita CacheLectura de donde guarda los valores.
+
+    CacheLRU lo cumple en memoria del proceso. Un backend compartido entre workers (Redis o similar)
+    tendria que implementar estos mismos metodos serializando los valores (son tuplas/filas de columnas).
+    """
+
+    def obtener(self, clave: Hashable): ...
+
+    def guardar(self, clave: Hashable, valor): ...
+
+    def borrar(self, clave: Hashable): ...
+
+    def limpiar(self): ...
+
+
+class CacheLRU:
+    """Cache en memoria del proceso con desalojo LRU y vencimiento opcional por TTL.
+
+    Es segura para usar desde varios hilos (los endpoints sync corren en el threadpool).
+    Con varios workers de uvicorn cada proceso tiene su propia cache.
+    """
+
+    def __init__(self, max_elementos: int, ttl_segundos: Optional[float] = None):
+        self.max_elementos = max_elementos
+        self.ttl_segundos = ttl_segundos
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _vencido(self, vence: Optional[float]):
+        return vence is not None and vence <= time.monotonic()
+
+    def obtener(self, clave: Hashable):
+        with self._lock:
+            elemento = self._datos.get(clave)
+            if elemento is None:
+                return None
+
+            valor, vence = elemento
+            if self._vencido(vence):
+                del self._datos[clave]
+                return None
+
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave: Hashable, valor):
+        vence = time.monotonic() + self.ttl_segundos if self.ttl_segundos else None
+
+        with self._lock:
+            self._datos[clave] = (valor, vence)
+            self._datos.move_to_end(clave)
+
+            while len(self._datos) > self.max_elementos:
+                self._datos.popitem(last=False)
+
+    def actualizar(self, clave: Hashable, funcion: Callable):
+        # aplica funcion(valor) solo si la clave esta en cache, sin cambiar su vencimiento
+        with self._lock:
+            elemento = self._datos.get(clave)
+            if elemento is None:
+                return
+
+            valor, vence = elemento
+            if self._vencido(vence):
+                del self._datos[clave]
+                return
+
+            self._datos[clave] = (funcion(valor), vence)
+
+    def borrar(self, clave: Hashable):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheLectura:
+    """Cache read-through delante de una busqueda por clave (por ejemplo buscar_persona por id).
+
+    obtener() devuelve el valor guardado o lo carga con la funcion recibida y lo guarda. Las funciones que
+    modifican los datos llaman a invalidar() despues del commit. Cuenta aciertos y fallos para las metricas.
+    """
+
+    def __init__(self, backend: BackendCache):
+        self.backend = backend
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: Hashable, cargar: Callable):
+        # la busqueda y los contadores bajo el mismo lock: se llama desde varios hilos del threadpool
+        with self._lock:
+            valor = self.backend.obtener(clave)
+            if valor is not None:
+                self.aciertos += 1
+                return valor
+
+            self.fallos += 1
+            invalidaciones_antes = self.invalidaciones
+
+        # los None (no encontrado) no se guardan
+        valor = cargar()
+
+        # si hubo una invalidacion mientras se cargaba, el valor leido puede ser anterior al cambio
+        with self._lock:
+            if valor is not None and invalidaciones_antes == self.invalidaciones:
+                self.backend.guardar(clave, valor)
+
+        return valor
+
+    def invalidar(self, *claves: Hashable):
+        with self._lock:
+            self.invalidaciones += 1
+            for clave in claves:
+                self.backend.borrar(clave)
+
+    def limpiar(self):
+        with self._lock:
+            self.invalidaciones += 1
+            self.backend.limpiar()
+
+    def metricas(self):
+        with self._lock:
+            aciertos, fallos, invalidaciones = self.aciertos, self.fallos, self.invalidaciones
+
+        consultas = aciertos + fallos
+        return {
+            "aciertos": aciertos,
+            "fallos": fallos,
+            "ratio_aciertos": round(aciertos / consultas, 4) if consultas else None,
+            "invalidaciones": invalidaciones,
+        }
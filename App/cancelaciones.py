@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left
+from datetime import date, timedelta
+from sqlalchemy.orm import Session
+
+from .cache import CacheLRU
+from .models import Turno
+from .config import (ESTADO_CANCELADO, DIAS_LIMITE_CANCELACIONES, CACHE_CANCELACIONES_MAX_PERSONAS,
+                     CACHE_CANCELACIONES_TTL_SEGUNDOS)
+
+
+# por cada persona se guardan, ordenados, los (fecha, turno_id) de sus turnos cancelados dentro de la ventana de
+# DIAS_LIMITE_CANCELACIONES, asi contar las cancelaciones recientes es una busqueda binaria y no un COUNT
+# sobre turnos. Se actualiza desde crudTurnos cada vez que un turno entra o sale del estado cancelado.
+# Con el id del turno agregar o quitar dos veces el mismo cambio no lo cuenta dos veces (por ejemplo si la
+# lista se leyo de la base con el turno ya cancelado), y dos cancelaciones del mismo dia siguen siendo dos.
+cache_cancelaciones = CacheLRU(CACHE_CANCELACIONES_MAX_PERSONAS, CACHE_CANCELACIONES_TTL_SEGUNDOS)
+
+# igual que en disponibilidad: evita guardar fechas leidas antes de un cambio concurrente
+_modificaciones = 0
+_lock_modificaciones = threading.Lock()
+
+
+def inicio_ventana():
+    return date.today() - timedelta(days=DIAS_LIMITE_CANCELACIONES)
+
+
+def obtener_fechas_cancelaciones(db: Session, persona_id: int):
+
+    fechas = cache_cancelaciones.obtener(persona_id)
+    if fechas is not None:
+        return fechas
+
+    modificaciones_antes = _modificaciones
+
+    filas = db.query(Turno.fecha, Turno.id).filter(
+        Turno.persona_id == persona_id,
+        Turno.estado == ESTADO_CANCELADO,
+        Turno.fecha >= inicio_ventana()
+    ).order_by(Turno.fecha, Turno.id).all()
+    fechas = [(fila.fecha, fila.id) for fila in filas]
+
+    with _lock_modificaciones:
+        if modificaciones_antes == _modificaciones:
+            cache_cancelaciones.guardar(persona_id, fechas)
+
+    return fechas
+
+
+def contar_cancelaciones(db: Session, persona_id: int, dias_limite: int = DIAS_LIMITE_CANCELACIONES):
+
+    fecha_limite = date.today() - timedelta(days=dias_limite)
+
+    # una ventana mas larga que la guardada no se puede responder desde memoria
+    if fecha_limite < inicio_ventana():
+        return db.query(Turno).filter(
+            Turno.persona_id == persona_id,
+            Turno.estado == ESTADO_CANCELADO,
+            Turno.fecha >= fecha_limite
+        ).count()
+
+    fechas = obtener_fechas_cancelaciones(db, persona_id)
+    # (fecha_limite,) queda antes de cualquier (fecha_limite, turno_id)
+    return len(fechas) - bisect_left(fechas, (fecha_limite,))
+
+
+# se arma una lista nueva en vez de modificarla, porque otro hilo puede estar contando sobre la anterior
+def _agregar(fechas: list, cancelacion: tuple):
+    posicion = bisect_left(fechas, cancelacion)
+    if posicion < len(fechas) and fechas[posicion] == cancelacion:
+        return fechas
+    return fechas[:posicion] + [cancelacion] + fechas[posicion:]
+
+
+def _quitar(fechas: list, cancelacion: tuple):
+    posicion = bisect_left(fechas, cancelacion)
+    if posicion < len(fechas) and fechas[posicion] == cancelacion:
+        return fechas[:posicion] + fechas[posicion + 1:]
+    return fechas
+
+
+def registrar_cambio_cancelacion(persona_id: int, turno_id: int, anterior, nuevo):
+    # anterior y nuevo son tuplas (fecha, hora, estado, recurso_id) como en disponibilidad.registrar_cambio_turno
+    global _modificaciones
+
+    with _lock_modificaciones:
+        _modificaciones += 1
+
+        if anterior is not None and anterior[2] == ESTADO_CANCELADO:
+            cache_cancelaciones.actualizar(persona_id, lambda fechas: _quitar(fechas, (anterior[0], turno_id)))
+
+        if nuevo is not None and nuevo[2] == ESTADO_CANCELADO and nuevo[0] >= inicio_ventana():
+            cache_cancelaciones.actualizar(persona_id, lambda fechas: _agregar(fechas, (nuevo[0], turno_id)))
+
+
+def limpiar_cache_cancelaciones():
+    global _modificaciones
+
+    with _lock_modificaciones:
+        _modificaciones += 1
+        cache_cancelaciones.limpiar()
+
+
+def reconstruir_cancelaciones(db: Session):
+    # recalcula todo desde turnos con una sola consulta (por ejemplo despues de cambios hechos fuera de la API)
+    global _modificaciones
+
+    modificaciones_antes = _modificaciones
+
+    filas = db.query(Turno.persona_id, Turno.fecha, Turno.id).filter(
+        Turno.estado == ESTADO_CANCELADO,
+        Turno.fecha >= inicio_ventana()
+    ).order_by(Turno.persona_id, Turno.fecha, Turno.id).all()
+
+    fechas_por_persona = {}
+    for persona_id, fecha, turno_id in filas:
+        fechas_por_persona.setdefault(persona_id, []).append((fecha, turno_id))
+
+    with _lock_modificaciones:
+        cache_cancelaciones.limpiar()
+        # si hubo cambios durante la consulta se deja la cache vacia y se carga de a una persona
+        if modificaciones_antes == _modificaciones:
+            for persona_id, fechas in fechas_por_persona.items():
+                cache_cancelaciones.guardar(persona_id, fechas)
+        _modificaciones += 1
+
+    return {"personas": len(fechas_por_persona), "cancelaciones": len(filas)}
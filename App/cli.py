@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import sys
+
+from .database import Base, engine
+from .importacion import FORMATOS_IMPORTACION, leer_filas, importar_personas, importar_turnos
+from .migraciones import aplicar_migraciones
+from .utils import sesion_db
+from .config import TAMANIO_LOTE_IMPORTACION
+
+
+# Comandos de consola, se corren desde la raiz del repo:
+#   python -m App.cli importar personas personas.csv
+#   python -m App.cli importar turnos turnos.ndjson --lote 5000
+IMPORTADORES = {
+    "personas": importar_personas,
+    "turnos": importar_turnos,
+}
+
+
+def comando_importar(args):
+    formato = args.formato or os.path.splitext(args.archivo)[1].lstrip(".").lower()
+
+    with open(args.archivo, encoding="utf-8-sig", newline="") as archivo:
+        filas = list(leer_filas(archivo, formato))
+
+    # la base puede no estar creada todavia si se importa antes de levantar la API
+    Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+
+    with sesion_db() as db:
+        resultado = IMPORTADORES[args.entidad](db, filas, args.lote)
+
+    json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+    return 1 if resultado["errores"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m App.cli")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    importar = subcomandos.add_parser("importar", help="carga masiva desde CSV o NDJSON")
+    importar.add_argument("entidad", choices=IMPORTADORES)
+    importar.add_argument("archivo")
+    importar.add_argument("--formato", choices=FORMATOS_IMPORTACION, help="por defecto se toma de la extension del archivo")
+    importar.add_argument("--lote", type=int, default=TAMANIO_LOTE_IMPORTACION, help="filas por transaccion")
+    importar.set_defaults(funcion=comando_importar)
+
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
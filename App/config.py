@@ -7,10 +7,41 @@ load_dotenv()
 # Variables de base de datos (arreglar el espacio)
 URL_BASE_DATOS = os.getenv("URL_BASE_DATOS")
 
+# Pool de conexiones (se aplica al motor sync y al async)
+POOL_TAMANIO = int(os.getenv("POOL_TAMANIO", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT_SEGUNDOS = int(os.getenv("POOL_TIMEOUT_SEGUNDOS", "30"))
+POOL_RECICLAR_SEGUNDOS = int(os.getenv("POOL_RECICLAR_SEGUNDOS", "1800"))
+POOL_PRE_PING = os.getenv("POOL_PRE_PING", "true").lower() == "true"
+
+# PRAGMAs que se aplican a cada conexion SQLite nueva (vacio = no se aplica)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = os.getenv("SQLITE_MMAP_SIZE", "268435456")
+SQLITE_CACHE_SIZE = os.getenv("SQLITE_CACHE_SIZE", "-65536")
+SQLITE_BUSY_TIMEOUT_MS = os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")
+SQLITE_FOREIGN_KEYS = os.getenv("SQLITE_FOREIGN_KEYS", "ON")
+
+# Logs: nivel, archivo opcional y consultas lentas (SQL_ECHO=true vuelve a escribir todas las sentencias)
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+LOG_ARCHIVO = os.getenv("LOG_ARCHIVO", "")
+LOG_SQL_LENTO_MS = float(os.getenv("LOG_SQL_LENTO_MS", "100"))
+LOG_SQL_MUESTREO = float(os.getenv("LOG_SQL_MUESTREO", "1"))
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+
+# Sesiones async (AsyncSession) en lugar de sesiones sync en el threadpool
+USAR_SESION_ASYNC = os.getenv("USAR_SESION_ASYNC", "false").lower() == "true"
+# si no se define, se usa la misma base con el driver async (sqlite -> aiosqlite)
+URL_BASE_DATOS_ASYNC = os.getenv("URL_BASE_DATOS_ASYNC") or URL_BASE_DATOS.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
 # Variables de turnos
 HORARIO_INICIO = os.getenv("HORARIO_INICIO")
 HORARIO_FIN = os.getenv("HORARIO_FIN")
 INTERVALO_TURNOS_MINUTOS = int(os.getenv("INTERVALO_TURNOS_MINUTOS"))
+# horarios distintos por dia de la semana ("sabado=09:00-13:00,domingo=", vacio = no se atiende)
+HORARIOS_POR_DIA = os.getenv("HORARIOS_POR_DIA", "")
+# fechas sin atencion, separadas por coma (AAAA-MM-DD)
+FERIADOS = os.getenv("FERIADOS", "")
 MAX_TURNOS_CANCELADOS = int(os.getenv("MAX_TURNOS_CANCELADOS"))
 DIAS_LIMITE_CANCELACIONES = int(os.getenv("DIAS_LIMITE_CANCELACIONES"))
 
@@ -25,4 +56,47 @@ ESTADO_ASISTIDO = os.getenv("ESTADO_ASISTIDO")
 
 # Variables para reportes
 MIN_CANCELADOS_DEFAULT = int(os.getenv("MIN_CANCELADOS_DEFAULT", "5"))
-LIMIT_PAGINACION_DEFAULT = int(os.getenv("LIMIT_PAGINACION_DEFAULT", "5"))
\ No newline at end of file
+LIMIT_PAGINACION_DEFAULT = int(os.getenv("LIMIT_PAGINACION_DEFAULT", "5"))
+# cantidad maxima de ids por cada IN (...) en las consultas por lotes
+TAMANIO_LOTE_CONSULTAS = int(os.getenv("TAMANIO_LOTE_CONSULTAS", "500"))
+# segundos que se reutiliza el total de registros de un reporte paginado
+TTL_TOTAL_REPORTES_SEGUNDOS = int(os.getenv("TTL_TOTAL_REPORTES_SEGUNDOS", "30"))
+
+# Paginacion por cursor de /turnos y /personas
+LIMITE_LISTADO_DEFAULT = int(os.getenv("LIMITE_LISTADO_DEFAULT", "100"))
+LIMITE_LISTADO_MAX = int(os.getenv("LIMITE_LISTADO_MAX", "1000"))
+
+# Cache de disponibilidad (cantidad de dias, de cada recurso, en memoria y vencimiento de cada dia)
+CACHE_DISPONIBILIDAD_MAX_DIAS = int(os.getenv("CACHE_DISPONIBILIDAD_MAX_DIAS", "366"))
+CACHE_DISPONIBILIDAD_TTL_SEGUNDOS = int(os.getenv("CACHE_DISPONIBILIDAD_TTL_SEGUNDOS", "60"))
+MAX_DIAS_RANGO_DISPONIBILIDAD = int(os.getenv("MAX_DIAS_RANGO_DISPONIBILIDAD", "92"))
+
+# Cache de cancelaciones recientes por persona
+CACHE_CANCELACIONES_MAX_PERSONAS = int(os.getenv("CACHE_CANCELACIONES_MAX_PERSONAS", "100000"))
+CACHE_CANCELACIONES_TTL_SEGUNDOS = int(os.getenv("CACHE_CANCELACIONES_TTL_SEGUNDOS", "300"))
+
+# Cache de buscar_persona / buscar_turno por id (elementos de cada una y vencimiento, que acota
+# cuanto puede ver un worker un cambio hecho por otro)
+CACHE_BUSQUEDAS_MAX_ELEMENTOS = int(os.getenv("CACHE_BUSQUEDAS_MAX_ELEMENTOS", "10000"))
+CACHE_BUSQUEDAS_TTL_SEGUNDOS = int(os.getenv("CACHE_BUSQUEDAS_TTL_SEGUNDOS", "30"))
+
+# Cache de respuestas JSON de /turnos, /personas y /reportes/* con ETag (respuestas en memoria, vencimiento
+# que acota cuanto se sirve una respuesta que cambio otro worker, y tamaño maximo de cada una en bytes)
+CACHE_RESPUESTAS_MAX_ELEMENTOS = int(os.getenv("CACHE_RESPUESTAS_MAX_ELEMENTOS", "256"))
+CACHE_RESPUESTAS_TTL_SEGUNDOS = int(os.getenv("CACHE_RESPUESTAS_TTL_SEGUNDOS", "60"))
+CACHE_RESPUESTAS_MAX_BYTES = int(os.getenv("CACHE_RESPUESTAS_MAX_BYTES", "1048576"))
+
+# Importacion masiva (filas por transaccion)
+TAMANIO_LOTE_IMPORTACION = int(os.getenv("TAMANIO_LOTE_IMPORTACION", "1000"))
+
+# Reportes en PDF (procesos que renderizan, limite de filas y cache de documentos ya generados)
+PDF_PROCESOS = int(os.getenv("PDF_PROCESOS", "2"))
+PDF_MAX_FILAS = int(os.getenv("PDF_MAX_FILAS", "5000"))
+CACHE_PDF_MAX_DOCUMENTOS = int(os.getenv("CACHE_PDF_MAX_DOCUMENTOS", "64"))
+CACHE_PDF_TTL_SEGUNDOS = int(os.getenv("CACHE_PDF_TTL_SEGUNDOS", "600"))
+
+# Reportes de analitica (filas por bloque leido con pandas)
+TAMANIO_LOTE_ANALITICA = int(os.getenv("TAMANIO_LOTE_ANALITICA", "50000"))
+
+# Cambio de estado de muchos turnos a la vez (cantidad maxima de ids por request)
+MAX_TURNOS_CAMBIO_ESTADO = int(os.getenv("MAX_TURNOS_CAMBIO_ESTADO", "1000"))
@@ -1,16 +1,27 @@
-from datetime import date, timedelta
+from datetime import date
 from fastapi import HTTPException
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 
-from .utils import validar_email, validar_formato_fecha, validar_fecha_nacimiento
+from .utils import validar_formato_fecha, validar_fecha_nacimiento, codificar_cursor, decodificar_cursor, validar_limite
+from .cache import CacheLRU, CacheLectura
+from .cancelaciones import contar_cancelaciones
 from .models import Persona, Turno
-from .config import MAX_TURNOS_CANCELADOS, DIAS_LIMITE_CANCELACIONES, ESTADO_CANCELADO
+from .config import (MAX_TURNOS_CANCELADOS, DIAS_LIMITE_CANCELACIONES, LIMITE_LISTADO_DEFAULT,
+                     CACHE_BUSQUEDAS_MAX_ELEMENTOS, CACHE_BUSQUEDAS_TTL_SEGUNDOS)
+
+
+COLUMNAS_PERSONA = (Persona.id, Persona.nombre, Persona.email, Persona.dni, Persona.telefono,
+                    Persona.fecha_nacimiento, Persona.habilitado)
+
+# filas de buscar_persona por id. Las funciones que modifican o eliminan personas la invalidan despues del commit
+cache_personas = CacheLectura(CacheLRU(CACHE_BUSQUEDAS_MAX_ELEMENTOS, CACHE_BUSQUEDAS_TTL_SEGUNDOS))
 
 
 def crear_persona(db: Session, datos: dict):
-    # Validar email
-    email_normalizado = validar_email(datos["email"])
+    # el email ya viene validado y normalizado (utils.normalizar_email, en el threadpool)
+    email_normalizado = datos["email"]
     
     # Verificar que no exista otra persona con los mismos datos
     verificar_persona_existente(db, email_normalizado, datos["dni"], datos["telefono"])
@@ -31,25 +42,41 @@ def crear_persona(db: Session, datos: dict):
     
     db.add(nueva_persona)
     db.commit()
-    db.refresh(nueva_persona)
     
     return nueva_persona
 
-def obtener_todas_personas(db: Session):
-    return db.query(Persona).all()
+def obtener_todas_personas(db: Session, cursor: str = None, limite: int = LIMITE_LISTADO_DEFAULT, habilitado: bool = None):
+    validar_limite(limite)
+
+    consulta = db.query(*COLUMNAS_PERSONA)
+    if habilitado is not None:
+        consulta = consulta.filter(Persona.habilitado == habilitado)
+
+    # keyset sobre el id, igual que listar_turnos
+    if cursor is not None:
+        (ultimo_id,) = decodificar_cursor(cursor, int)
+        consulta = consulta.filter(Persona.id > ultimo_id)
+
+    personas = consulta.order_by(Persona.id).limit(limite + 1).all()
+
+    siguiente_cursor = None
+    if len(personas) > limite:
+        personas = personas[:limite]
+        siguiente_cursor = codificar_cursor(personas[-1].id)
+
+    return personas, siguiente_cursor
 
 
 def actualizar_persona(db: Session, persona_id: int, datos: dict):
-    persona = buscar_persona(db, persona_id)
+    persona = cargar_persona(db, persona_id)
     
     if "dni" in datos:
         raise HTTPException(status_code=400, detail="No se permite modificar el DNI de una persona")
     if "fecha_nacimiento" in datos:
         raise HTTPException(status_code=400, detail="No se permite modificar la fecha de nacimiento de una persona")
     
-    email_normalizado = None
-    if "email" in datos:
-        email_normalizado = validar_email(datos["email"])
+    # el email ya viene validado y normalizado (utils.normalizar_email, en el threadpool)
+    email_normalizado = datos.get("email")
 
     # Verificar duplicados si se están actualizando campos únicos
     if "email" in datos or "telefono" in datos:
@@ -78,13 +105,7 @@ def actualizar_persona(db: Session, persona_id: int, datos: dict):
         nuevo_estado_habilitado = datos["habilitado"]
         if nuevo_estado_habilitado is False:
             # Verificar 5 cancelaciones en los ultimos 6 meses antes de deshabilitar
-            fecha_actual = date.today()
-            fecha_limite = fecha_actual - timedelta(days=DIAS_LIMITE_CANCELACIONES)
-            turnos_cancelados = db.query(Turno).filter(
-                Turno.persona_id == persona.id,
-                Turno.estado == ESTADO_CANCELADO,
-                Turno.fecha >= fecha_limite
-            ).count()
+            turnos_cancelados = contar_cancelaciones(db, persona.id, DIAS_LIMITE_CANCELACIONES)
             if turnos_cancelados < MAX_TURNOS_CANCELADOS:
                 raise HTTPException(
                     status_code=400,
@@ -93,12 +114,37 @@ def actualizar_persona(db: Session, persona_id: int, datos: dict):
         persona.habilitado = nuevo_estado_habilitado
     
     db.commit()
-    db.refresh(persona)
+    cache_personas.invalidar(persona_id)
     return persona
 
 
+def eliminar_persona(db: Session, persona_id: int):
+    persona = cargar_persona(db, persona_id)
+
+    # Verificar si la persona tiene turnos asociados, si tiene no se elimina y se devuelve la cantidad
+    turnos_asociados = db.query(Turno).filter(Turno.persona_id == persona_id).count()
+    if turnos_asociados > 0:
+        return turnos_asociados
+
+    db.delete(persona)
+    db.commit()
+    cache_personas.invalidar(persona_id)
+    return 0
+
+
 def buscar_persona(db: Session, persona_id: int):
+    # solo lectura: devuelve la fila de columnas de la persona, desde la cache si ya se busco
+    persona = cache_personas.obtener(
+        persona_id, lambda: db.query(*COLUMNAS_PERSONA).filter(Persona.id == persona_id).first()
+    )
+    if not persona:
+        raise HTTPException(status_code=404, detail="Persona no encontrada")
 
+    return persona
+
+
+def cargar_persona(db: Session, persona_id: int):
+    # la Persona del ORM, sin cache, para las funciones que la modifican
     persona = db.query(Persona).filter(Persona.id == persona_id).first()
     if not persona:
         raise HTTPException(status_code=404, detail="Persona no encontrada")
@@ -112,15 +158,19 @@ def validar_persona_habilitada(db: Session, persona_id: int):
     if not persona.habilitado:
         raise HTTPException(status_code=400, detail="La persona está deshabilitada")
 
-def cambiar_estado_persona(db: Session, persona_id: int):
+def cambiar_habilitado_persona(db: Session, persona_id: int, habilitado: bool):
+    # un UPDATE condicional sin cargar la persona: si no existe o ya tenia ese valor no se actualiza nada.
+    # Devuelve si cambio (y solo en ese caso hace commit e invalida la cache)
+    cambiada = db.execute(
+        update(Persona).where(Persona.id == persona_id, Persona.habilitado.is_not(habilitado))
+        .values(habilitado=habilitado).execution_options(synchronize_session=False)
+    ).rowcount
+    if not cambiada:
+        return False
 
-    persona = buscar_persona(db, persona_id)
-    
-    # si esta habilitada la deshabilita, y viceversa
-    persona.habilitado = not persona.habilitado
-    
     db.commit()
-    db.refresh(persona)
+    cache_personas.invalidar(persona_id)
+    return True
 
 
 def verificar_persona_existente(db: Session, email: str, dni: str, telefono: str):
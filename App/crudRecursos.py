@@ -0,0 +1,65 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .models import Recurso
+from .schemas import recurso_base, actualizar_recurso_base
+
+
+def crear_recurso(db: Session, datos: recurso_base):
+
+    verificar_nombre_recurso(db, datos.nombre)
+
+    nuevo_recurso = Recurso(nombre=datos.nombre, tipo=datos.tipo, activo=True)
+
+    db.add(nuevo_recurso)
+    db.commit()
+
+    return nuevo_recurso
+
+
+def listar_recursos(db: Session, activo: bool = None):
+    consulta = db.query(Recurso.id, Recurso.nombre, Recurso.tipo, Recurso.activo)
+    if activo is not None:
+        consulta = consulta.filter(Recurso.activo == activo)
+
+    return consulta.order_by(Recurso.id).all()
+
+
+def actualizar_recurso(db: Session, recurso_id: int, datos: actualizar_recurso_base):
+    recurso = buscar_recurso(db, recurso_id)
+
+    if datos.nombre is not None and datos.nombre != recurso.nombre:
+        verificar_nombre_recurso(db, datos.nombre)
+        recurso.nombre = datos.nombre
+
+    if datos.tipo is not None:
+        recurso.tipo = datos.tipo
+
+    # un recurso desactivado conserva sus turnos, pero no recibe nuevos
+    if datos.activo is not None:
+        recurso.activo = datos.activo
+
+    db.commit()
+    return recurso
+
+
+def buscar_recurso(db: Session, recurso_id: int):
+
+    recurso = db.query(Recurso).filter(Recurso.id == recurso_id).first()
+    if not recurso:
+        raise HTTPException(status_code=404, detail="Recurso no encontrado")
+
+    return recurso
+
+
+def validar_recurso_activo(db: Session, recurso_id: int):
+
+    recurso = buscar_recurso(db, recurso_id)
+    if not recurso.activo:
+        raise HTTPException(status_code=400, detail="El recurso no está activo")
+
+
+def verificar_nombre_recurso(db: Session, nombre: str):
+
+    if db.query(Recurso.id).filter(Recurso.nombre == nombre).first():
+        raise HTTPException(status_code=400, detail="Ya existe un recurso con este nombre")
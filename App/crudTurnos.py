@@ -1,89 +1,212 @@
-from datetime import date, time, timedelta, datetime
+from collections import defaultdict
+from datetime import date, time, timedelta
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, tuple_, update, insert, select, bindparam
+from sqlalchemy.exc import IntegrityError
 from App.schemas import turno_base
 
-from .utils import validar_fecha_pasada, validar_turno_modificable
-from .crudPersonas import validar_persona_habilitada, buscar_persona, cambiar_estado_persona
-from .models import Turno, Persona
-from .config import HORARIO_INICIO, HORARIO_FIN, INTERVALO_TURNOS_MINUTOS, MAX_TURNOS_CANCELADOS, DIAS_LIMITE_CANCELACIONES, ESTADO_PENDIENTE, ESTADO_CONFIRMADO, ESTADO_CANCELADO, ESTADO_ASISTIDO, MIN_CANCELADOS_DEFAULT, LIMIT_PAGINACION_DEFAULT
+from .utils import validar_fecha_pasada, validar_turno_modificable, codificar_cursor, decodificar_cursor, validar_limite, en_lotes
+from .crudPersonas import validar_persona_habilitada, cambiar_habilitado_persona, cache_personas
+from .crudRecursos import validar_recurso_activo
+from .cache import CacheLRU, CacheLectura
+from .cancelaciones import contar_cancelaciones, registrar_cambio_cancelacion
+from .disponibilidad import (obtener_mascara_ocupados, obtener_mascaras_rango, obtener_recursos_libres_rango, horarios_libres,
+                             registrar_cambio_turno)
+from .grilla import GRILLA
+from .models import Turno, Persona, Recurso, ID_RECURSO_GENERAL
+from .config import MAX_TURNOS_CANCELADOS, DIAS_LIMITE_CANCELACIONES, ESTADO_PENDIENTE, ESTADO_CONFIRMADO, ESTADO_CANCELADO, ESTADO_ASISTIDO, MIN_CANCELADOS_DEFAULT, LIMIT_PAGINACION_DEFAULT, MAX_DIAS_RANGO_DISPONIBILIDAD, LIMITE_LISTADO_DEFAULT, TTL_TOTAL_REPORTES_SEGUNDOS, TAMANIO_LOTE_CONSULTAS, MAX_TURNOS_CAMBIO_ESTADO, CACHE_BUSQUEDAS_MAX_ELEMENTOS, CACHE_BUSQUEDAS_TTL_SEGUNDOS
+
+
+COLUMNAS_TURNO = (Turno.id, Turno.persona_id, Turno.recurso_id, Turno.fecha, Turno.hora, Turno.estado)
+
+# filas de buscar_turno por id. Las funciones que modifican, eliminan o cambian el estado de turnos
+# la invalidan despues del commit
+cache_turnos = CacheLectura(CacheLRU(CACHE_BUSQUEDAS_MAX_ELEMENTOS, CACHE_BUSQUEDAS_TTL_SEGUNDOS))
+
+# INSERT ... SELECT desde personas y recursos: el turno solo se inserta si la persona existe y esta
+# habilitada y el recurso existe y esta activo, asi la reserva es una sola sentencia y un commit.
+# Se arma una sola vez con parametros, en cada reserva solo cambian los valores (dml_strategy="raw" para que
+# el ORM no tome el diccionario de parametros como un insert masivo)
+INSERTAR_TURNO = insert(Turno).from_select(
+    ["persona_id", "recurso_id", "fecha", "hora", "estado"],
+    select(
+        bindparam("persona_id", type_=Turno.persona_id.type),
+        bindparam("recurso_id", type_=Turno.recurso_id.type),
+        bindparam("fecha", type_=Turno.fecha.type),
+        bindparam("hora", type_=Turno.hora.type),
+        bindparam("estado", type_=Turno.estado.type)
+    ).select_from(Persona).join(Recurso, Recurso.id == bindparam("recurso_id")).where(
+        Persona.id == bindparam("persona_id"), Persona.habilitado.is_(True), Recurso.activo.is_(True)
+    )
+).returning(*COLUMNAS_TURNO).execution_options(dml_strategy="raw")
 
 
 def crear_turno(db: Session, turno_data: turno_base):
 
     persona_id = turno_data.persona_id
-    
-    validar_persona_habilitada(db, persona_id)
+    recurso_id = turno_data.recurso_id if turno_data.recurso_id is not None else ID_RECURSO_GENERAL
+
+    # primero lo que no necesita la base
+    validar_fecha_pasada(turno_data.fecha)
 
+    # solo se valida que la hora este en la grilla de ese dia, que este libre lo garantiza el indice unico
+    # ux_turnos_recurso_fecha_hora_activos al insertar (sin leer antes los turnos ocupados)
+    hora_solicitada = turno_data.hora.replace(second=0, microsecond=0)
+    if not GRILLA.horario_valido(turno_data.fecha, hora_solicitada):
+        raise HTTPException(
+            status_code=400, 
+            detail=f"El horario {hora_solicitada.strftime('%H:%M')} del día {turno_data.fecha} no está disponible"
+        )
+
+    # las cancelaciones recientes salen de memoria (cancelaciones.py)
     turnos_cancelados = validar_turnos_cancelados(db, persona_id)
     if turnos_cancelados:
         raise HTTPException(
             status_code=400, 
             detail=f"No se puede asignar turno: la persona tiene {MAX_TURNOS_CANCELADOS} o más turnos cancelados en los últimos 6 meses."
         )
-    
-    validar_fecha_pasada(turno_data.fecha)
 
-    horarios_disponibles = obtener_turnos_disponibles(db, turno_data.fecha)
-    hora_solicitada = turno_data.hora.strftime("%H:%M")
-
-    print(f"🔍 Hora solicitada: {hora_solicitada}")
-    print(f"🔍 Horarios disponibles: {horarios_disponibles}")
-    
-    if hora_solicitada not in horarios_disponibles:
+    try:
+        nuevo_turno = db.execute(INSERTAR_TURNO, {
+            "persona_id": persona_id, "recurso_id": recurso_id, "fecha": turno_data.fecha,
+            "hora": hora_solicitada, "estado": turno_data.estado
+        }).first()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
-            status_code=400, 
-            detail=f"El horario {hora_solicitada} del día {turno_data.fecha} no está disponible"
+            status_code=400,
+            detail=f"El horario {hora_solicitada.strftime('%H:%M')} del día {turno_data.fecha} no está disponible"
         )
-    
-    
-    nuevo_turno = Turno(
-        persona_id=persona_id,
-        fecha=turno_data.fecha,
-        hora=turno_data.hora,
-        estado=turno_data.estado
-    )
-    
-    db.add(nuevo_turno)
+
+    if nuevo_turno is None:
+        # no se inserto nada: se leen la persona (de la base, no de la cache) y el recurso para saber cual fallo
+        cache_personas.invalidar(persona_id)
+        validar_persona_habilitada(db, persona_id)
+        validar_recurso_activo(db, recurso_id)
+
+        # los dos estaban bien: la persona o el recurso cambiaron en el medio
+        raise HTTPException(status_code=409, detail="La persona o el recurso fueron modificados por otra operacion, intentar de nuevo")
+
     db.commit()
-    db.refresh(nuevo_turno)
+
+    nuevo = (nuevo_turno.fecha, nuevo_turno.hora, nuevo_turno.estado, nuevo_turno.recurso_id)
+    registrar_cambio_turno(None, nuevo)
+    registrar_cambio_cancelacion(persona_id, nuevo_turno.id, None, nuevo)
     
     return nuevo_turno
 
-def listar_turnos(db: Session):
-    return db.query(Turno).all()
+
+def guardar_turno(db: Session, turno: Turno):
+    # si el horario ya esta tomado por otro turno activo la base rechaza el commit
+    # (fecha y hora se leen antes porque el rollback expira el turno)
+    fecha, hora = turno.fecha, turno.hora
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"El horario {hora.strftime('%H:%M')} del día {fecha} no está disponible"
+        )
+
+
+def listar_turnos(db: Session, cursor: str = None, limite: int = LIMITE_LISTADO_DEFAULT,
+                  fecha: date = None, estado: str = None, persona_id: int = None, recurso_id: int = None):
+    validar_limite(limite)
+
+    # solo columnas: el listado no necesita objetos Turno (ver schemas.turno_respuesta)
+    consulta = db.query(*COLUMNAS_TURNO)
+    if fecha is not None:
+        consulta = consulta.filter(Turno.fecha == fecha)
+    if estado is not None:
+        consulta = consulta.filter(Turno.estado == estado)
+    if persona_id is not None:
+        consulta = consulta.filter(Turno.persona_id == persona_id)
+    if recurso_id is not None:
+        consulta = consulta.filter(Turno.recurso_id == recurso_id)
+
+    # keyset sobre el id: la pagina N cuesta lo mismo que la primera (no hay OFFSET)
+    if cursor is not None:
+        (ultimo_id,) = decodificar_cursor(cursor, int)
+        consulta = consulta.filter(Turno.id > ultimo_id)
+
+    # se pide una fila de mas para saber si hay pagina siguiente
+    turnos = consulta.order_by(Turno.id).limit(limite + 1).all()
+
+    siguiente_cursor = None
+    if len(turnos) > limite:
+        turnos = turnos[:limite]
+        siguiente_cursor = codificar_cursor(turnos[-1].id)
+
+    return turnos, siguiente_cursor
 
 def actualizar_turno(db: Session, turno_id: int, turno_data: turno_base):
 
-    turno = buscar_turno(db, turno_id)
+    turno = cargar_turno(db, turno_id)
     
     validar_turno_modificable(turno)
 
+    anterior = (turno.fecha, turno.hora, turno.estado, turno.recurso_id)
+
+    if turno_data.recurso_id is not None and turno_data.recurso_id != turno.recurso_id:
+        validar_recurso_activo(db, turno_data.recurso_id)
+        turno.recurso_id = turno_data.recurso_id
+
     if turno_data.fecha is not None:
         validar_fecha_pasada(turno_data.fecha)
         turno.fecha = turno_data.fecha
     
     if turno_data.hora is not None:
-        turno.hora = turno_data.hora
-    
+        # igual que en crear_turno: sin segundos, para que el indice unico compare el mismo horario
+        turno.hora = turno_data.hora.replace(second=0, microsecond=0)
+
+    # el nuevo dia u horario tiene que estar en la grilla, igual que al crear el turno
+    if (turno.fecha, turno.hora) != anterior[:2] and not GRILLA.horario_valido(turno.fecha, turno.hora):
+        raise HTTPException(
+            status_code=400,
+            detail=f"El horario {turno.hora.strftime('%H:%M')} del día {turno.fecha} no está disponible"
+        )
+
     if turno_data.estado is not None:
         turno.estado = turno_data.estado
     
-    db.commit()
-    db.refresh(turno)
+    guardar_turno(db, turno)
+    cache_turnos.invalidar(turno_id)
+
+    nuevo = (turno.fecha, turno.hora, turno.estado, turno.recurso_id)
+    registrar_cambio_turno(anterior, nuevo)
+    registrar_cambio_cancelacion(turno.persona_id, turno_id, anterior, nuevo)
     
     return turno
 
 def eliminar_turno(db: Session, turno_id: int):
 
-    turno = buscar_turno(db, turno_id)
+    turno = cargar_turno(db, turno_id)
+    persona_id = turno.persona_id
+    anterior = (turno.fecha, turno.hora, turno.estado, turno.recurso_id)
+
     db.delete(turno)
     db.commit()
+    cache_turnos.invalidar(turno_id)
+
+    registrar_cambio_turno(anterior, None)
+    registrar_cambio_cancelacion(persona_id, turno_id, anterior, None)
 
 
 def buscar_turno(db: Session, turno_id: int):
+    # solo lectura: devuelve la fila de columnas del turno, desde la cache si ya se busco
+    turno = cache_turnos.obtener(
+        turno_id, lambda: db.execute(select(*COLUMNAS_TURNO).where(Turno.id == turno_id)).first()
+    )
+    if not turno:
+        raise HTTPException(status_code=404, detail="Turno no encontrado")
+
+    return turno
+
 
+def cargar_turno(db: Session, turno_id: int):
+    # el Turno del ORM, sin cache, para las funciones que lo modifican
     turno = db.query(Turno).filter(Turno.id == turno_id).first()
     if not turno:
         raise HTTPException(status_code=404, detail="Turno no encontrado")
@@ -91,113 +214,238 @@ def buscar_turno(db: Session, turno_id: int):
     return turno
 
 
-def cancelar_turno(db: Session, turno_id: int):
-    turno = buscar_turno(db, turno_id)
-    
+def cambiar_estado_turno(db: Session, turno_id: int, nuevo_estado: str, *condiciones):
+    # UPDATE ... WHERE id = ? AND <condiciones> RETURNING: valida y cambia el estado en una sola sentencia.
+    # Devuelve la fila del turno ya modificado, o None si no existe o no cumplia las condiciones
+    turno = db.execute(
+        update(Turno).where(Turno.id == turno_id, *condiciones).values(estado=nuevo_estado)
+        .returning(*COLUMNAS_TURNO).execution_options(synchronize_session=False)
+    ).first()
+
+    if turno is not None:
+        db.commit()
+        cache_turnos.invalidar(turno_id)
+
+    return turno
+
+
+def transicion_rechazada(turno):
+    # se llega aca si el UPDATE no aplico pero el turno releido cumple las condiciones:
+    # otro request lo modifico en el medio
+    return HTTPException(status_code=409, detail=f"El turno {turno.id} fue modificado por otra operacion, intentar de nuevo")
+
+
+def condiciones_transicion(nuevo_estado: str):
+    # condiciones del UPDATE para pasar un turno a nuevo_estado (las reglas de validar_transicion, en SQL)
+    if nuevo_estado == ESTADO_CANCELADO:
+        return (Turno.estado.notin_([ESTADO_ASISTIDO, ESTADO_CANCELADO]), Turno.fecha >= date.today())
+    if nuevo_estado == ESTADO_CONFIRMADO:
+        return (Turno.estado == ESTADO_PENDIENTE,)
+    if nuevo_estado == ESTADO_ASISTIDO:
+        return (Turno.estado == ESTADO_CONFIRMADO,)
+
+    raise HTTPException(
+        status_code=400,
+        detail=f"El estado debe ser {ESTADO_CONFIRMADO}, {ESTADO_CANCELADO} o {ESTADO_ASISTIDO}"
+    )
+
+
+def validar_transicion(turno, nuevo_estado: str):
+    # se usa solo cuando el UPDATE no aplico, para devolver el mismo error que cancelar / confirmar / asistencia
+    if nuevo_estado == ESTADO_ASISTIDO:
+        if turno.estado != ESTADO_CONFIRMADO:
+            raise HTTPException(
+                status_code=400,
+                detail="Solo se puede marcar asistencia en turnos confirmados"
+            )
+        return
+
     validar_turno_modificable(turno)
-    
-    validar_fecha_pasada(turno.fecha)
-    
-    turno.estado = ESTADO_CANCELADO
-    db.commit()
-    db.refresh(turno)
+
+    if nuevo_estado == ESTADO_CANCELADO:
+        validar_fecha_pasada(turno.fecha)
+    elif turno.estado != ESTADO_PENDIENTE:
+        raise HTTPException(
+            status_code=400,
+            detail="Solo se pueden confirmar turnos pendientes"
+        )
+
+
+def registrar_cambio_estado(turno):
+    # solo la cancelacion cambia la disponibilidad y las cancelaciones en memoria.
+    # El estado anterior no vuelve en el RETURNING, pero la condicion del UPDATE asegura que no era cancelado
+    if turno.estado == ESTADO_CANCELADO:
+        anterior = (turno.fecha, turno.hora, None, turno.recurso_id)
+        nuevo = (turno.fecha, turno.hora, turno.estado, turno.recurso_id)
+        registrar_cambio_turno(anterior, nuevo)
+        registrar_cambio_cancelacion(turno.persona_id, turno.id, anterior, nuevo)
+
+
+def aplicar_transicion(db: Session, turno_id: int, nuevo_estado: str):
+    turno = cambiar_estado_turno(db, turno_id, nuevo_estado, *condiciones_transicion(nuevo_estado))
+
+    if turno is None:
+        # solo si no se pudo cambiar se lee el turno, para devolver el mismo error que antes
+        # (de la base: si la copia en cache estaba desactualizada, se reemplaza)
+        cache_turnos.invalidar(turno_id)
+        turno = buscar_turno(db, turno_id)
+        validar_transicion(turno, nuevo_estado)
+        raise transicion_rechazada(turno)
+
+    registrar_cambio_estado(turno)
 
     return turno
-    
 
-def contar_turnos_cancelados(db: Session, persona_id: int, dias_limite: int):
 
-    fecha_actual = date.today()
-    fecha_limite = fecha_actual - timedelta(days=dias_limite)
+def cancelar_turno(db: Session, turno_id: int):
+    return aplicar_transicion(db, turno_id, ESTADO_CANCELADO)
 
-    turnos_cancelados = db.query(Turno).filter(
-        Turno.persona_id == persona_id,
-        Turno.estado == ESTADO_CANCELADO,
-        Turno.fecha >= fecha_limite
-    ).count()
-    
-    return turnos_cancelados
+
+def cambiar_estado_turnos(db: Session, turno_ids: list, nuevo_estado: str):
+    # cambio de estado de muchos turnos en una transaccion: un UPDATE ... WHERE id IN (...) AND <condiciones>
+    # RETURNING por lote de ids, y una sola lectura de los que no cambiaron para informar el motivo
+    condiciones = condiciones_transicion(nuevo_estado)
+
+    ids = list(dict.fromkeys(turno_ids))
+    if not ids or len(ids) > MAX_TURNOS_CAMBIO_ESTADO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se deben enviar entre 1 y {MAX_TURNOS_CAMBIO_ESTADO} turnos"
+        )
+
+    modificados = {}
+    for lote in en_lotes(ids, TAMANIO_LOTE_CONSULTAS):
+        filas = db.execute(
+            update(Turno).where(Turno.id.in_(lote), *condiciones).values(estado=nuevo_estado)
+            .returning(*COLUMNAS_TURNO).execution_options(synchronize_session=False)
+        ).all()
+        modificados.update((fila.id, fila) for fila in filas)
+
+    errores = {}
+    rechazados = [turno_id for turno_id in ids if turno_id not in modificados]
+    for lote in en_lotes(rechazados, TAMANIO_LOTE_CONSULTAS):
+        for turno in db.execute(select(*COLUMNAS_TURNO).where(Turno.id.in_(lote))):
+            try:
+                validar_transicion(turno, nuevo_estado)
+                errores[turno.id] = transicion_rechazada(turno).detail
+            except HTTPException as e:
+                errores[turno.id] = e.detail
+
+    if modificados:
+        db.commit()
+        cache_turnos.invalidar(*modificados)
+
+    for turno in modificados.values():
+        registrar_cambio_estado(turno)
+
+    resultados = []
+    for turno_id in ids:
+        if turno_id in modificados:
+            resultados.append({"id": turno_id, "ok": True, "estado": nuevo_estado})
+        else:
+            resultados.append({"id": turno_id, "ok": False, "error": errores.get(turno_id, "Turno no encontrado")})
+
+    return {"modificados": len(modificados), "resultados": resultados}
+
+
+def contar_turnos_cancelados(db: Session, persona_id: int, dias_limite: int):
+    # sale de las fechas de cancelacion guardadas en memoria (ver cancelaciones.py), sin COUNT sobre turnos
+    return contar_cancelaciones(db, persona_id, dias_limite)
 
 def obtener_turnos_por_fecha(db: Session, fecha: date):
     return db.query(Turno).filter(Turno.fecha == fecha).all()
 
 
-def obtener_turnos_disponibles(db: Session, fecha: date):
+def recurso_de_consulta(db: Session, recurso_id: int = None):
+    # sin recurso se consulta el recurso general (sin leerlo), si se indica uno tiene que existir y estar activo
+    if recurso_id is None:
+        return ID_RECURSO_GENERAL
+
+    validar_recurso_activo(db, recurso_id)
+    return recurso_id
+
+
+def obtener_turnos_disponibles(db: Session, fecha: date, recurso_id: int = None):
     
     validar_fecha_pasada(fecha)
-    
-    horarios_posibles = []
-    hora_actual = time.fromisoformat(HORARIO_INICIO) 
-    hora_limite = time.fromisoformat(HORARIO_FIN)
-
-    while hora_actual <= hora_limite:
-        horarios_posibles.append(hora_actual)
-        
-        datetime_temp = datetime.combine(fecha, hora_actual) + timedelta(minutes=INTERVALO_TURNOS_MINUTOS)
-        hora_actual = datetime_temp.time()
-        
-    turnos_ocupados = db.query(Turno.hora).filter(
-        Turno.fecha == fecha,
-        Turno.estado != ESTADO_CANCELADO
-    ).all()
-    
-    horas_ocupadas = {turno.hora for turno in turnos_ocupados}
-    
-    return [
-        hora.strftime("%H:%M") 
-        for hora in horarios_posibles 
-        if hora not in horas_ocupadas
-    ]
+    recurso_id = recurso_de_consulta(db, recurso_id)
+
+    # la mascara de horarios ocupados sale de la cache si la fecha ya fue consultada para ese recurso
+    return horarios_libres(fecha, obtener_mascara_ocupados(db, recurso_id, fecha))
+
+
+def validar_rango_disponibilidad(fecha_desde: date, fecha_hasta: date):
+
+    validar_fecha_pasada(fecha_desde)
+
+    if fecha_desde > fecha_hasta:
+        raise HTTPException(status_code=400, detail="La fecha 'desde' debe ser anterior a la fecha 'hasta'")
+
+    if (fecha_hasta - fecha_desde).days + 1 > MAX_DIAS_RANGO_DISPONIBILIDAD:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar los {MAX_DIAS_RANGO_DISPONIBILIDAD} dias"
+        )
+
+
+def obtener_turnos_disponibles_rango(db: Session, fecha_desde: date, fecha_hasta: date, primeros: int = None,
+                                     recurso_id: int = None):
+
+    validar_rango_disponibilidad(fecha_desde, fecha_hasta)
+
+    if primeros is not None and primeros < 1:
+        raise HTTPException(status_code=400, detail="primeros debe ser mayor a 0")
+
+    recurso_id = recurso_de_consulta(db, recurso_id)
+    mascaras = obtener_mascaras_rango(db, recurso_id, fecha_desde, fecha_hasta)
+
+    dias = []
+    restantes = primeros
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        libres = horarios_libres(fecha, mascaras.get(fecha, 0))
+
+        # con primeros=N se corta apenas se juntan N horarios libres
+        if restantes is not None:
+            libres = libres[:restantes]
+            restantes -= len(libres)
+
+        if libres or restantes is None:
+            dias.append((fecha, libres))
+
+        if restantes == 0:
+            break
+
+        fecha += timedelta(days=1)
+
+    return dias
+
+
+def obtener_recursos_libres(db: Session, fecha_desde: date, fecha_hasta: date):
+    # por cada dia, los horarios en los que hay al menos un recurso activo libre (y cuantos)
+    validar_rango_disponibilidad(fecha_desde, fecha_hasta)
+
+    return obtener_recursos_libres_rango(db, fecha_desde, fecha_hasta)
 
 
 def validar_turnos_cancelados(db: Session, persona_id: int):
     
     turnos_cancelados = contar_turnos_cancelados(db, persona_id, DIAS_LIMITE_CANCELACIONES)
 
-    # Deshabilitar la persona si tiene 5 o más cancelaciones
+    # Deshabilitar la persona si tiene 5 o más cancelaciones.
+    # Si ya estaba deshabilitada o no existe no se actualiza nada y crear_turno informa el motivo
     if turnos_cancelados >= MAX_TURNOS_CANCELADOS:
-        persona = buscar_persona(db, persona_id)
-        if persona and persona.habilitado:
-            cambiar_estado_persona(db, persona_id)
-            return True
+        return cambiar_habilitado_persona(db, persona_id, False)
 
     return False
 
 
 def confirmar_turno(db: Session, turno_id: int):
-    
-    turno = buscar_turno(db, turno_id)
-    
-    validar_turno_modificable(turno)
-    
-    if turno.estado != ESTADO_PENDIENTE:
-        raise HTTPException(
-            status_code=400,
-            detail="Solo se pueden confirmar turnos pendientes"
-        )
-    
-    turno.estado = ESTADO_CONFIRMADO
-    db.commit()
-    db.refresh(turno)
-    
-    return turno
+    return aplicar_transicion(db, turno_id, ESTADO_CONFIRMADO)
 
 
 def marcar_asistencia_turno(db: Session, turno_id: int):
-    
-    turno = buscar_turno(db, turno_id)
-
-    if turno.estado != ESTADO_CONFIRMADO:
-        raise HTTPException(
-            status_code=400,
-            detail="Solo se puede marcar asistencia en turnos confirmados"
-        )
-    
-    turno.estado = ESTADO_ASISTIDO
-    db.commit()
-    db.refresh(turno)
-    
-    return turno
+    return aplicar_transicion(db, turno_id, ESTADO_ASISTIDO)
 
 # punto E
 def obtener_turnos_por_fecha_con_persona(db: Session, fecha: date):
@@ -208,27 +456,35 @@ def obtener_turnos_por_fecha_con_persona(db: Session, fecha: date):
     return turnos
 
 
-def obtener_turnos_cancelados_mes_actual(db: Session):
-    fecha_actual = datetime.now()
-    mes_actual = fecha_actual.month
-    año_actual = fecha_actual.year
-    
-    turnos = db.query(
-        func.extract('year', Turno.fecha).label('año'),
-        func.extract('month', Turno.fecha).label('mes'),
-        func.count(Turno.id).label('cantidad'),
-        Turno, Persona
-    ).join(Persona, Turno.persona_id == Persona.id).filter(
-        Turno.estado == ESTADO_CANCELADO,
-        func.extract('month', Turno.fecha) == mes_actual,
-        func.extract('year', Turno.fecha) == año_actual
-    ).group_by(
-        func.extract('year', Turno.fecha),
-        func.extract('month', Turno.fecha),
-        Turno.id, Persona.id
-    ).all()
-    
-    return turnos
+def consulta_cancelaciones_por_mes(db: Session, fecha_desde: date, fecha_hasta: date):
+    # el filtro es un rango sobre fecha (usa el indice), extract solo se usa para agrupar
+    anio = func.extract('year', Turno.fecha)
+    mes = func.extract('month', Turno.fecha)
+
+    return db.query(
+        anio.label('anio'),
+        mes.label('mes'),
+        func.count().label('cantidad')
+    ).filter(
+        Turno.fecha >= fecha_desde,
+        Turno.fecha <= fecha_hasta,
+        Turno.estado == ESTADO_CANCELADO
+    ).group_by(anio, mes).order_by(anio, mes)
+
+
+def obtener_cancelaciones_por_mes(db: Session, fecha_desde: date, fecha_hasta: date):
+
+    conteos = consulta_cancelaciones_por_mes(db, fecha_desde, fecha_hasta).all()
+    cantidades = {(int(fila.anio), int(fila.mes)): fila.cantidad for fila in conteos}
+
+    # se devuelven todos los meses del periodo, con 0 en los que no hubo cancelaciones
+    meses = []
+    anio_actual, mes_actual = fecha_desde.year, fecha_desde.month
+    while (anio_actual, mes_actual) <= (fecha_hasta.year, fecha_hasta.month):
+        meses.append((anio_actual, mes_actual, cantidades.get((anio_actual, mes_actual), 0)))
+        anio_actual, mes_actual = (anio_actual + 1, 1) if mes_actual == 12 else (anio_actual, mes_actual + 1)
+
+    return meses
 
 
 def obtener_turnos_por_persona(db: Session, dni: str):
@@ -239,46 +495,158 @@ def obtener_turnos_por_persona(db: Session, dni: str):
     return turnos
 
 
-def obtener_personas_con_turnos_cancelados(db: Session, min_cancelados: int = MIN_CANCELADOS_DEFAULT):
-    personas = db.query(Persona).join(Turno, Persona.id == Turno.persona_id).filter(
+def obtener_personas_con_turnos_cancelados(db: Session, min_cancelados: int = MIN_CANCELADOS_DEFAULT, solo_cantidades: bool = False):
+    # una consulta agrupada trae las personas con su cantidad de cancelados
+    personas = db.query(Persona, func.count(Turno.id).label("cantidad")).join(Turno, Persona.id == Turno.persona_id).filter(
         Turno.estado == ESTADO_CANCELADO
     ).group_by(Persona.id).having(
         func.count(Turno.id) >= min_cancelados
-    ).all()
+    ).order_by(Persona.id).all()
+
+    # y los turnos cancelados de todas ellas se traen juntos con IN (por lotes), no uno por persona
+    turnos_por_persona = defaultdict(list)
+    if not solo_cantidades:
+        ids_personas = [persona.id for persona, _ in personas]
+        for lote in en_lotes(ids_personas, TAMANIO_LOTE_CONSULTAS):
+            turnos_cancelados = db.query(Turno).filter(
+                Turno.persona_id.in_(lote),
+                Turno.estado == ESTADO_CANCELADO
+            ).order_by(Turno.persona_id, Turno.fecha, Turno.hora).all()
+
+            for turno in turnos_cancelados:
+                turnos_por_persona[turno.persona_id].append(turno)
     
     resultado = []
-    for persona in personas:
-        turnos_cancelados = db.query(Turno).filter(
-            Turno.persona_id == persona.id,
-            Turno.estado == ESTADO_CANCELADO
-        ).all()
-        
-        resultado.append({
+    for persona, cantidad in personas:
+        item = {
             'persona': persona,
-            'cantidad_cancelados': len(turnos_cancelados),
-            'turnos_cancelados': turnos_cancelados
-        })
+            'cantidad_cancelados': cantidad
+        }
+        if not solo_cantidades:
+            item['turnos_cancelados'] = turnos_por_persona[persona.id]
+
+        resultado.append(item)
     
     return resultado
 
 
-def obtener_turnos_confirmados_periodo(db: Session, fecha_desde: date, fecha_hasta: date, offset: int = 0, limit: int = LIMIT_PAGINACION_DEFAULT):
-    turnos = db.query(Turno, Persona).join(Persona, Turno.persona_id == Persona.id).filter(
+# total de turnos confirmados por (desde, hasta), para no contar de nuevo en cada pagina
+cache_totales_confirmados = CacheLRU(256, TTL_TOTAL_REPORTES_SEGUNDOS)
+
+
+def obtener_turnos_confirmados_periodo(db: Session, fecha_desde: date, fecha_hasta: date, cursor: str = None, limite: int = LIMIT_PAGINACION_DEFAULT):
+    validar_limite(limite)
+
+    filtros = [
         Turno.estado == ESTADO_CONFIRMADO,
         Turno.fecha >= fecha_desde,
         Turno.fecha <= fecha_hasta
-    ).offset(offset).limit(limit).all()
+    ]
+    consulta = db.query(Turno, Persona).join(Persona, Turno.persona_id == Persona.id).filter(*filtros)
+
+    if cursor is None:
+        # primera pagina: el total sale de la misma consulta con una funcion de ventana
+        consulta = consulta.add_columns(func.count().over().label("total"))
+    else:
+        # keyset sobre (fecha, hora, id), el mismo orden del reporte, en lugar de OFFSET
+        fecha, hora, turno_id = decodificar_cursor(cursor, date.fromisoformat, time.fromisoformat, int)
+        consulta = consulta.filter(tuple_(Turno.fecha, Turno.hora, Turno.id) > tuple_(fecha, hora, turno_id))
+
+    filas = consulta.order_by(Turno.fecha, Turno.hora, Turno.id).limit(limite + 1).all()
+
+    clave_total = (fecha_desde, fecha_hasta)
+    if cursor is None:
+        total = filas[0].total if filas else 0
+        cache_totales_confirmados.guardar(clave_total, total)
+        turnos = [(turno, persona) for turno, persona, _ in filas]
+    else:
+        turnos = filas
+        total = cache_totales_confirmados.obtener(clave_total)
+        if total is None:
+            total = db.query(Turno).filter(*filtros).count()
+            cache_totales_confirmados.guardar(clave_total, total)
+
+    siguiente_cursor = None
+    if len(turnos) > limite:
+        turnos = turnos[:limite]
+        ultimo = turnos[-1][0]
+        siguiente_cursor = codificar_cursor(ultimo.fecha.isoformat(), ultimo.hora.isoformat(), ultimo.id)
+
+    return turnos, total, siguiente_cursor
+
+
+def obtener_personas_por_estado(db: Session, habilitada: bool):
+    personas = db.query(Persona.id, Persona.nombre, Persona.dni, Persona.email, Persona.habilitado).filter(
+        Persona.habilitado == habilitada
+    ).all()
     
-    total = db.query(Turno).filter(
+    return personas
+
+
+# Consultas para exportar los reportes en streaming (exportacion.respuesta_reporte): solo traen las
+# columnas del reporte, sin armar objetos Turno/Persona, y se leen de a bloques con yield_per
+COLUMNAS_TURNO_CON_PERSONA = (
+    Turno.id, Turno.fecha, Turno.hora, Turno.estado,
+    Persona.id.label("persona_id"), Persona.nombre.label("persona_nombre"), Persona.dni.label("persona_dni")
+)
+
+
+def consulta_turnos_por_fecha(db: Session, fecha: date):
+    return db.query(*COLUMNAS_TURNO_CON_PERSONA).join(Persona, Turno.persona_id == Persona.id).filter(
+        Turno.fecha == fecha
+    ).order_by(Turno.hora, Turno.id).yield_per(TAMANIO_LOTE_CONSULTAS)
+
+
+def consulta_turnos_cancelados(db: Session, fecha_desde: date, fecha_hasta: date):
+    return db.query(Turno.id, Turno.persona_id, Turno.fecha, Turno.hora, Turno.estado).filter(
+        Turno.fecha >= fecha_desde,
+        Turno.fecha <= fecha_hasta,
+        Turno.estado == ESTADO_CANCELADO
+    ).order_by(Turno.fecha, Turno.hora, Turno.id).yield_per(TAMANIO_LOTE_CONSULTAS)
+
+
+def consulta_turnos_por_persona(db: Session, dni: str):
+    return db.query(*COLUMNAS_TURNO_CON_PERSONA, Persona.email.label("persona_email")).join(
+        Persona, Turno.persona_id == Persona.id
+    ).filter(
+        Persona.dni == dni
+    ).order_by(Turno.fecha, Turno.hora, Turno.id).yield_per(TAMANIO_LOTE_CONSULTAS)
+
+
+def consulta_personas_con_turnos_cancelados(db: Session, min_cancelados: int = MIN_CANCELADOS_DEFAULT, solo_cantidades: bool = False):
+    cancelados = db.query(
+        Turno.persona_id,
+        func.count(Turno.id).label("cantidad_cancelados")
+    ).filter(
+        Turno.estado == ESTADO_CANCELADO
+    ).group_by(Turno.persona_id).having(
+        func.count(Turno.id) >= min_cancelados
+    ).subquery()
+
+    columnas = [Persona.id.label("persona_id"), Persona.nombre, Persona.dni, Persona.email, cancelados.c.cantidad_cancelados]
+    consulta = db.query(*columnas).join(cancelados, cancelados.c.persona_id == Persona.id)
+
+    if solo_cantidades:
+        return consulta.order_by(Persona.id).yield_per(TAMANIO_LOTE_CONSULTAS)
+
+    # una fila por turno cancelado, con los datos de la persona repetidos
+    return consulta.add_columns(
+        Turno.id.label("turno_id"), Turno.fecha, Turno.hora
+    ).join(Turno, Turno.persona_id == Persona.id).filter(
+        Turno.estado == ESTADO_CANCELADO
+    ).order_by(Persona.id, Turno.fecha, Turno.hora).yield_per(TAMANIO_LOTE_CONSULTAS)
+
+
+def consulta_turnos_confirmados(db: Session, fecha_desde: date, fecha_hasta: date):
+    # el periodo completo, sin paginar
+    return db.query(*COLUMNAS_TURNO_CON_PERSONA).join(Persona, Turno.persona_id == Persona.id).filter(
         Turno.estado == ESTADO_CONFIRMADO,
         Turno.fecha >= fecha_desde,
         Turno.fecha <= fecha_hasta
-    ).count()
-    
-    return turnos, total
+    ).order_by(Turno.fecha, Turno.hora, Turno.id).yield_per(TAMANIO_LOTE_CONSULTAS)
 
 
-def obtener_personas_por_estado(db: Session, habilitada: bool):
-    personas = db.query(Persona).filter(Persona.habilitado == habilitada).all()
-    
-    return personas
\ No newline at end of file
+def consulta_personas_por_estado(db: Session, habilitada: bool):
+    return db.query(Persona.id, Persona.nombre, Persona.dni, Persona.email, Persona.habilitado).filter(
+        Persona.habilitado == habilitada
+    ).order_by(Persona.id).yield_per(TAMANIO_LOTE_CONSULTAS)
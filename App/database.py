@@ -1,11 +1,82 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 
-from .config import URL_BASE_DATOS
+from .config import (URL_BASE_DATOS, URL_BASE_DATOS_ASYNC, USAR_SESION_ASYNC, POOL_TAMANIO, POOL_MAX_OVERFLOW,
+                     POOL_TIMEOUT_SEGUNDOS, POOL_RECICLAR_SEGUNDOS, POOL_PRE_PING, SQLITE_JOURNAL_MODE,
+                     SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_FOREIGN_KEYS,
+                     SQL_ECHO)
+from .logs import registrar_log_sql_lento
+from .metricas import MetricasPool, crear_pool_con_metricas
 
 
-engine = create_engine(URL_BASE_DATOS, echo=True, future=True)
+# misma configuracion de pool para los dos motores
+opciones_pool = {
+    "pool_size": POOL_TAMANIO,
+    "max_overflow": POOL_MAX_OVERFLOW,
+    "pool_timeout": POOL_TIMEOUT_SEGUNDOS,
+    "pool_recycle": POOL_RECICLAR_SEGUNDOS,
+    "pool_pre_ping": POOL_PRE_PING,
+}
 
-SesionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+# PRAGMAs de SQLite definidos en el .env, los que quedan vacios no se aplican
+PRAGMAS_SQLITE = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "foreign_keys": SQLITE_FOREIGN_KEYS,
+}
 
-Base = declarative_base()
\ No newline at end of file
+
+def registrar_pragmas_sqlite(engine, pragmas: dict = PRAGMAS_SQLITE):
+    # los PRAGMAs son por conexion, por eso se aplican en el evento connect de cada conexion nueva del pool
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def aplicar_pragmas(conexion_dbapi, registro_conexion):
+        cursor = conexion_dbapi.cursor()
+        for pragma, valor in pragmas.items():
+            if valor:
+                cursor.execute(f"PRAGMA {pragma}={valor}")
+        cursor.close()
+
+
+metricas_pool = MetricasPool()
+
+engine = create_engine(
+    URL_BASE_DATOS, echo=SQL_ECHO, future=True,
+    poolclass=crear_pool_con_metricas(QueuePool, metricas_pool), **opciones_pool
+)
+metricas_pool.escuchar(engine)
+registrar_pragmas_sqlite(engine)
+registrar_log_sql_lento(engine)
+
+# expire_on_commit=False: despues del commit los objetos conservan los valores que se escribieron,
+# asi no hace falta un refresh (un SELECT mas) para devolverlos en la respuesta
+SesionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+
+# el motor async solo se crea si se activa en el .env, asi no hace falta el driver async si no se usa
+engine_async = None
+SesionAsyncLocal = None
+metricas_pool_async = None
+
+if USAR_SESION_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    metricas_pool_async = MetricasPool()
+
+    engine_async = create_async_engine(
+        URL_BASE_DATOS_ASYNC, echo=SQL_ECHO,
+        poolclass=crear_pool_con_metricas(AsyncAdaptedQueuePool, metricas_pool_async), **opciones_pool
+    )
+    metricas_pool_async.escuchar(engine_async.sync_engine)
+    registrar_pragmas_sqlite(engine_async.sync_engine)
+    registrar_log_sql_lento(engine_async.sync_engine)
+
+    SesionAsyncLocal = async_sessionmaker(bind=engine_async, autoflush=False, autocommit=False, expire_on_commit=False)
+
+Base = declarative_base()
@@ -0,0 +1,163 @@
+import threading
+from datetime import date, time, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .cache import CacheLRU
+from .models import Recurso, Turno
+from .grilla import GRILLA
+from .config import ESTADO_CANCELADO, CACHE_DISPONIBILIDAD_MAX_DIAS, CACHE_DISPONIBILIDAD_TTL_SEGUNDOS
+
+
+# por cada (recurso, fecha) se guarda un entero usado como mascara de bits: el bit i en 1 indica que
+# el horario GRILLA.horas[i] de ese recurso esta ocupado por un turno no cancelado
+cache_ocupados = CacheLRU(CACHE_DISPONIBILIDAD_MAX_DIAS, CACHE_DISPONIBILIDAD_TTL_SEGUNDOS)
+
+# cuenta las modificaciones para no guardar en cache una mascara leida antes de un cambio concurrente
+_modificaciones = 0
+_lock_modificaciones = threading.Lock()
+
+
+def calcular_mascara(horas_ocupadas):
+    mascara = 0
+    for hora in horas_ocupadas:
+        indice = GRILLA.indice(hora)
+        if indice is not None:
+            mascara |= 1 << indice
+
+    return mascara
+
+
+def obtener_mascara_ocupados(db: Session, recurso_id: int, fecha: date):
+
+    mascara = cache_ocupados.obtener((recurso_id, fecha))
+    if mascara is not None:
+        return mascara
+
+    modificaciones_antes = _modificaciones
+
+    # por el indice unico (recurso_id, fecha, hora) de los turnos activos
+    turnos_ocupados = db.query(Turno.hora).filter(
+        Turno.recurso_id == recurso_id,
+        Turno.fecha == fecha,
+        Turno.estado != ESTADO_CANCELADO
+    ).all()
+    mascara = calcular_mascara(turno.hora for turno in turnos_ocupados)
+
+    with _lock_modificaciones:
+        if modificaciones_antes == _modificaciones:
+            cache_ocupados.guardar((recurso_id, fecha), mascara)
+
+    return mascara
+
+
+def obtener_mascaras_rango(db: Session, recurso_id: int, fecha_desde: date, fecha_hasta: date):
+    # una sola consulta (por el indice de recurso y fecha) con los horarios ocupados de todo el rango,
+    # agrupados en una mascara por dia en una sola pasada
+    modificaciones_antes = _modificaciones
+
+    turnos_ocupados = db.query(Turno.fecha, Turno.hora).filter(
+        Turno.recurso_id == recurso_id,
+        Turno.fecha >= fecha_desde,
+        Turno.fecha <= fecha_hasta,
+        Turno.estado != ESTADO_CANCELADO
+    ).all()
+
+    mascaras = {}
+    for fecha, hora in turnos_ocupados:
+        indice = GRILLA.indice(hora)
+        if indice is not None:
+            mascaras[fecha] = mascaras.get(fecha, 0) | 1 << indice
+
+    # se aprovecha la consulta para dejar cargados en cache todos los dias del rango
+    with _lock_modificaciones:
+        if modificaciones_antes == _modificaciones:
+            fecha = fecha_desde
+            while fecha <= fecha_hasta:
+                cache_ocupados.guardar((recurso_id, fecha), mascaras.get(fecha, 0))
+                fecha += timedelta(days=1)
+
+    return mascaras
+
+
+def obtener_recursos_libres_rango(db: Session, fecha_desde: date, fecha_hasta: date):
+    # "cualquier recurso libre": una consulta agrupada por (fecha, hora) cuenta los recursos activos ocupados
+    # en cada horario del rango (por el indice (recurso_id, fecha, hora)), sin recorrer los recursos uno por uno.
+    # Devuelve por dia la lista de (hora, cantidad de recursos libres) de los horarios con al menos uno libre
+    recursos_activos = select(Recurso.id).where(Recurso.activo.is_(True))
+    cantidad_recursos = db.execute(select(func.count()).select_from(recursos_activos.subquery())).scalar()
+
+    ocupados = {
+        (fecha, hora): cantidad
+        for fecha, hora, cantidad in db.execute(
+            select(Turno.fecha, Turno.hora, func.count()).where(
+                Turno.recurso_id.in_(recursos_activos),
+                Turno.fecha >= fecha_desde,
+                Turno.fecha <= fecha_hasta,
+                Turno.estado != ESTADO_CANCELADO
+            ).group_by(Turno.fecha, Turno.hora)
+        )
+    }
+
+    dias = []
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        habilitados = GRILLA.mascara_habilitados(fecha)
+        horarios = []
+        for indice, hora in enumerate(GRILLA.horas):
+            libres = cantidad_recursos - ocupados.get((fecha, hora), 0)
+            if habilitados >> indice & 1 and libres > 0:
+                horarios.append((GRILLA.textos[indice], libres))
+
+        dias.append((fecha, horarios))
+        fecha += timedelta(days=1)
+
+    return dias
+
+
+def horarios_libres(fecha: date, mascara: int):
+    # los horarios habilitados ese dia (segun el dia de la semana y los feriados) que no estan ocupados
+    return GRILLA.libres(fecha, mascara)
+
+
+def _registrar_cambio(recurso_id: int, fecha: date, hora: time, ocupado: bool):
+    global _modificaciones
+
+    indice = GRILLA.indice(hora)
+
+    with _lock_modificaciones:
+        _modificaciones += 1
+        if indice is None:
+            return
+
+        bit = 1 << indice
+        if ocupado:
+            cache_ocupados.actualizar((recurso_id, fecha), lambda mascara: mascara | bit)
+        else:
+            cache_ocupados.actualizar((recurso_id, fecha), lambda mascara: mascara & ~bit)
+
+
+def limpiar_cache_disponibilidad():
+    # para cambios masivos (importaciones): se descarta todo y se vuelve a leer de la base
+    global _modificaciones
+
+    with _lock_modificaciones:
+        _modificaciones += 1
+        cache_ocupados.limpiar()
+
+
+def marcar_ocupado(recurso_id: int, fecha: date, hora: time):
+    _registrar_cambio(recurso_id, fecha, hora, True)
+
+
+def marcar_libre(recurso_id: int, fecha: date, hora: time):
+    _registrar_cambio(recurso_id, fecha, hora, False)
+
+
+def registrar_cambio_turno(anterior, nuevo):
+    # anterior y nuevo son tuplas (fecha, hora, estado, recurso_id), o None si el turno no existia / se elimino
+    if anterior is not None and anterior[2] != ESTADO_CANCELADO:
+        marcar_libre(anterior[3], anterior[0], anterior[1])
+
+    if nuevo is not None and nuevo[2] != ESTADO_CANCELADO:
+        marcar_ocupado(nuevo[3], nuevo[0], nuevo[1])
@@ -0,0 +1,134 @@
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+
+from .cache import CacheLRU
+from .reportesPdf import renderizar_pdf
+from .utils import sesion_db
+from .versionDatos import version_datos
+from .config import PDF_PROCESOS, PDF_MAX_FILAS, CACHE_PDF_MAX_DOCUMENTOS, CACHE_PDF_TTL_SEGUNDOS
+
+
+FORMATOS_EXPORTACION = ("json", "csv", "ndjson", "pdf")
+
+TIPOS_CONTENIDO = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "pdf": "application/pdf",
+}
+
+# PDFs ya generados por (consulta, parametros, version de los datos): mientras no haya escrituras
+# la misma descarga se sirve desde memoria
+cache_pdf = CacheLRU(CACHE_PDF_MAX_DOCUMENTOS, CACHE_PDF_TTL_SEGUNDOS)
+
+# el armado del PDF es CPU puro, se hace en otros procesos para no frenar el event loop ni tomar el GIL
+_pool_pdf = None
+
+
+def validar_formato_exportacion(formato: str, formatos=FORMATOS_EXPORTACION):
+    if formato not in formatos:
+        raise HTTPException(status_code=400, detail=f"Formato invalido, se espera uno de: {', '.join(formatos)}")
+
+
+def _texto(valor):
+    # fechas y horas como en las respuestas JSON de la API
+    return valor if valor is None or isinstance(valor, (int, float, bool)) else str(valor)
+
+
+def _lineas_csv(columnas, filas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow(fila)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # si no hubo filas queda solo el encabezado
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _lineas_ndjson(columnas, filas):
+    for fila in filas:
+        yield json.dumps(dict(zip(columnas, map(_texto, fila))), ensure_ascii=False) + "\n"
+
+
+def _pool():
+    global _pool_pdf
+
+    if _pool_pdf is None:
+        # spawn y no fork: el proceso de la API tiene hilos (logs, threadpool) que no se deben copiar
+        _pool_pdf = ProcessPoolExecutor(max_workers=PDF_PROCESOS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool_pdf
+
+
+def detener_pool_pdf():
+    global _pool_pdf
+
+    if _pool_pdf is not None:
+        _pool_pdf.shutdown(cancel_futures=True)
+        _pool_pdf = None
+
+
+def _leer_filas_pdf(consultar, *args):
+    with sesion_db() as db:
+        consulta = consultar(db, *args)
+        columnas = [columna["name"] for columna in consulta.column_descriptions]
+        # se lee una fila de mas para saber si se paso del limite sin traer todo el reporte
+        filas = [tuple(map(_texto, fila)) for fila in consulta.limit(PDF_MAX_FILAS + 1)]
+
+    if len(filas) > PDF_MAX_FILAS:
+        raise HTTPException(status_code=400, detail=f"El reporte supera las {PDF_MAX_FILAS} filas que se pueden exportar a PDF, usar formato=csv")
+
+    return columnas, filas
+
+
+async def respuesta_pdf(nombre: str, consultar, *args):
+    clave = (consultar.__name__, args, version_datos())
+    documento = cache_pdf.obtener(clave)
+
+    if documento is None:
+        columnas, filas = await run_in_threadpool(_leer_filas_pdf, consultar, *args)
+        documento = await asyncio.wrap_future(_pool().submit(renderizar_pdf, nombre, columnas, filas))
+        cache_pdf.guardar(clave, documento)
+
+    return Response(
+        documento,
+        media_type=TIPOS_CONTENIDO["pdf"],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.pdf"'},
+    )
+
+
+async def respuesta_reporte(formato: str, nombre: str, consultar, *args):
+    """Devuelve el reporte en streaming como CSV o NDJSON, o como PDF (ver respuesta_pdf).
+
+    consultar(db, *args) tiene que devolver una Query de columnas con yield_per: las filas se leen de a
+    bloques mientras se envian, asi la memoria no depende del tamaño del reporte.
+    """
+    if formato == "pdf":
+        return await respuesta_pdf(nombre, consultar, *args)
+
+    def generar():
+        # la sesion se abre aca porque se usa mientras se envia la respuesta, despues de salir del endpoint
+        with sesion_db() as db:
+            consulta = consultar(db, *args)
+            columnas = [columna["name"] for columna in consulta.column_descriptions]
+
+            lineas = _lineas_csv if formato == "csv" else _lineas_ndjson
+            yield from lineas(columnas, consulta)
+
+    extension = "csv" if formato == "csv" else "ndjson"
+    return StreamingResponse(
+        generar(),
+        media_type=TIPOS_CONTENIDO[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{extension}"'},
+    )
@@ -0,0 +1,100 @@
+from datetime import date, time, timedelta
+from typing import Optional
+
+from .config import HORARIO_INICIO, HORARIO_FIN, INTERVALO_TURNOS_MINUTOS, HORARIOS_POR_DIA, FERIADOS
+
+
+DIAS_SEMANA = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+
+
+def minutos(hora: time):
+    return hora.hour * 60 + hora.minute
+
+
+def _rango_minutos(inicio: str, fin: str, intervalo: int):
+    return range(minutos(time.fromisoformat(inicio)), minutos(time.fromisoformat(fin)) + 1, intervalo)
+
+
+class GrillaHorarios:
+    """Grilla de horarios de atencion, armada una sola vez al iniciar desde la configuracion.
+
+    Los horarios se guardan como minutos desde las 00:00. El indice de cada horario es la posicion del bit
+    en las mascaras de disponibilidad (disponibilidad.py), y cada dia de la semana tiene su mascara de
+    horarios habilitados (0 los dias que no se atiende y los feriados).
+    """
+
+    def __init__(self, horarios_por_dia: dict, feriados=(), intervalo: int = INTERVALO_TURNOS_MINUTOS):
+        # horarios_por_dia: dia de la semana (0 = lunes) -> minutos de los horarios de ese dia
+        self.intervalo = intervalo
+        self.minutos = tuple(sorted({m for horarios in horarios_por_dia.values() for m in horarios}))
+        self.horas = tuple(time(m // 60, m % 60) for m in self.minutos)
+        self.textos = tuple(hora.strftime("%H:%M") for hora in self.horas)
+        self._indice = {m: indice for indice, m in enumerate(self.minutos)}
+        self._mascaras_dia = tuple(
+            sum(1 << self._indice[m] for m in set(horarios_por_dia.get(dia, ())))
+            for dia in range(7)
+        )
+        self.feriados = frozenset(feriados)
+
+    @classmethod
+    def desde_config(cls):
+        # HORARIO_INICIO / HORARIO_FIN para todos los dias, con HORARIOS_POR_DIA se pisan algunos
+        # (por ejemplo "sabado=09:00-13:00,domingo=" atiende medio dia el sabado y no atiende el domingo)
+        general = _rango_minutos(HORARIO_INICIO, HORARIO_FIN, INTERVALO_TURNOS_MINUTOS)
+        horarios_por_dia = {dia: general for dia in range(7)}
+
+        for item in filter(None, (parte.strip() for parte in HORARIOS_POR_DIA.split(","))):
+            nombre, _, rango = item.partition("=")
+            nombre = nombre.strip().lower()
+            if nombre not in DIAS_SEMANA:
+                raise ValueError(f"HORARIOS_POR_DIA: dia invalido '{nombre}'")
+
+            rango = rango.strip()
+            if rango:
+                inicio, _, fin = rango.partition("-")
+                horarios_por_dia[DIAS_SEMANA.index(nombre)] = _rango_minutos(inicio.strip(), fin.strip(), INTERVALO_TURNOS_MINUTOS)
+            else:
+                horarios_por_dia[DIAS_SEMANA.index(nombre)] = ()
+
+        feriados = [date.fromisoformat(fecha.strip()) for fecha in FERIADOS.split(",") if fecha.strip()]
+        return cls(horarios_por_dia, feriados)
+
+    def indice(self, hora: time) -> Optional[int]:
+        # None si la hora no es un horario de la grilla (tampoco si tiene segundos)
+        if hora.second or hora.microsecond:
+            return None
+        return self._indice.get(minutos(hora))
+
+    def mascara_habilitados(self, fecha: date):
+        if fecha in self.feriados:
+            return 0
+        return self._mascaras_dia[fecha.weekday()]
+
+    def horario_valido(self, fecha: date, hora: time):
+        indice = self.indice(hora)
+        return indice is not None and bool(self.mascara_habilitados(fecha) >> indice & 1)
+
+    def horarios_del_dia(self, fecha: date):
+        mascara = self.mascara_habilitados(fecha)
+        return [hora for indice, hora in enumerate(self.horas) if mascara >> indice & 1]
+
+    def libres(self, fecha: date, mascara_ocupados: int):
+        libres = self.mascara_habilitados(fecha) & ~mascara_ocupados
+        return [texto for indice, texto in enumerate(self.textos) if libres >> indice & 1]
+
+    def dias_habilitados(self, desde: date, hasta: date):
+        # por cada horario de la grilla, cantidad de dias del periodo en que se atiende en ese horario
+        dias_por_semana = [0] * 7
+        fecha = desde
+        while fecha <= hasta:
+            if fecha not in self.feriados:
+                dias_por_semana[fecha.weekday()] += 1
+            fecha += timedelta(days=1)
+
+        return [
+            sum(cantidad for dia, cantidad in enumerate(dias_por_semana) if self._mascaras_dia[dia] >> indice & 1)
+            for indice in range(len(self.minutos))
+        ]
+
+
+GRILLA = GrillaHorarios.desde_config()
@@ -0,0 +1,272 @@
+import csv
+import json
+from datetime import date, time
+from fastapi import HTTPException
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .cancelaciones import limpiar_cache_cancelaciones
+from .disponibilidad import limpiar_cache_disponibilidad
+from .models import Persona, Recurso, Turno, ID_RECURSO_GENERAL
+from .utils import validar_email, validar_formato_fecha, validar_fecha_nacimiento, en_lotes
+from .config import (ESTADO_PENDIENTE, ESTADO_CONFIRMADO, ESTADO_CANCELADO, ESTADO_ASISTIDO,
+                     TAMANIO_LOTE_IMPORTACION, TAMANIO_LOTE_CONSULTAS)
+
+
+FORMATOS_IMPORTACION = ("csv", "ndjson")
+ESTADOS_VALIDOS = (ESTADO_PENDIENTE, ESTADO_CONFIRMADO, ESTADO_CANCELADO, ESTADO_ASISTIDO)
+
+CAMPOS_PERSONA = ("nombre", "email", "dni", "telefono", "fecha_nacimiento")
+CAMPOS_TURNO = ("persona_id", "fecha", "hora")
+
+
+class ErrorFila(Exception):
+    pass
+
+
+def leer_filas(lineas, formato: str):
+    # devuelve (numero_fila, datos) con datos=None si la fila no se pudo leer
+    if formato not in FORMATOS_IMPORTACION:
+        raise HTTPException(status_code=400, detail=f"Formato invalido, se espera uno de: {', '.join(FORMATOS_IMPORTACION)}")
+
+    if formato == "csv":
+        for numero_fila, fila in enumerate(csv.DictReader(lineas), start=1):
+            yield numero_fila, fila
+        return
+
+    numero_fila = 0
+    for linea in lineas:
+        if not linea.strip():
+            continue
+        numero_fila += 1
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            datos = None
+        yield numero_fila, datos if isinstance(datos, dict) else None
+
+
+def _validar_campos(datos, campos):
+    if datos is None:
+        raise ErrorFila("Fila con formato invalido")
+
+    faltantes = [campo for campo in campos if datos.get(campo) in (None, "")]
+    if faltantes:
+        raise ErrorFila(f"Faltan campos: {', '.join(faltantes)}")
+
+
+def _validar_persona(datos, dominios_verificados: dict):
+    _validar_campos(datos, CAMPOS_PERSONA)
+
+    # mismas validaciones que crear_persona (el DNS del email se consulta una vez por dominio en toda la carga)
+    try:
+        email = validar_email(str(datos["email"]), dominios_verificados)
+        validar_formato_fecha(str(datos["fecha_nacimiento"]))
+        fecha_nacimiento = date.fromisoformat(str(datos["fecha_nacimiento"]))
+        validar_fecha_nacimiento(fecha_nacimiento)
+    except HTTPException as e:
+        raise ErrorFila(e.detail)
+
+    return {
+        "nombre": str(datos["nombre"]),
+        "email": email,
+        "dni": str(datos["dni"]),
+        "telefono": str(datos["telefono"]),
+        "fecha_nacimiento": fecha_nacimiento,
+        "habilitado": True,
+    }
+
+
+def _validar_turno(datos):
+    _validar_campos(datos, CAMPOS_TURNO)
+
+    try:
+        persona_id = int(datos["persona_id"])
+        fecha = date.fromisoformat(str(datos["fecha"]))
+        hora = time.fromisoformat(str(datos["hora"])).replace(second=0, microsecond=0)
+        # recurso_id es opcional, sin recurso el turno va al recurso general
+        recurso_id = int(datos["recurso_id"]) if datos.get("recurso_id") not in (None, "") else ID_RECURSO_GENERAL
+    except ValueError:
+        raise ErrorFila("persona_id, recurso_id, fecha (YYYY-MM-DD) u hora (HH:MM) invalidos")
+
+    estado = datos.get("estado") or ESTADO_PENDIENTE
+    if estado not in ESTADOS_VALIDOS:
+        raise ErrorFila(f"Estado invalido: {estado}")
+
+    return {"persona_id": persona_id, "recurso_id": recurso_id, "fecha": fecha, "hora": hora, "estado": estado}
+
+
+def _validar_filas(filas, validar):
+    candidatas = []
+    errores = []
+    for numero_fila, datos in filas:
+        try:
+            candidatas.append((numero_fila, validar(datos)))
+        except ErrorFila as e:
+            errores.append({"fila": numero_fila, "error": str(e)})
+
+    return len(filas), candidatas, errores
+
+
+# la validacion de las filas no usa la base (salvo el DNS de los emails): se hace antes de la carga,
+# asi los endpoints la corren en el threadpool y con AsyncSession el event loop solo espera la base
+def validar_personas(filas):
+    # el DNS del email se consulta una vez por dominio en toda la carga
+    dominios_verificados = {}
+    return _validar_filas(filas, lambda datos: _validar_persona(datos, dominios_verificados))
+
+
+def validar_turnos(filas):
+    return _validar_filas(filas, _validar_turno)
+
+
+def preparar_importacion(contenido: bytes, formato: str, validar):
+    # lee y valida el cuerpo del request, devuelve lo que reciben cargar_personas / cargar_turnos
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El archivo debe estar codificado en UTF-8")
+
+    filas = list(leer_filas(texto.splitlines(), formato))
+    return validar(filas)
+
+
+def _insertar_lote(db: Session, modelo, filas_validas: list, errores: list):
+    # un insert con executemany y un commit por lote, si el lote falla no se cortan los demas
+    if not filas_validas:
+        return 0
+
+    try:
+        db.execute(insert(modelo), [valores for _, valores in filas_validas])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return _insertar_por_fila(db, modelo, filas_validas, errores)
+
+    return len(filas_validas)
+
+
+def _error_insercion(modelo, valores: dict):
+    # los mismos mensajes que la API, sin el texto del driver. Con las validaciones previas del lote solo
+    # fallan por datos unicos cargados en el medio por otro request
+    if modelo is Persona:
+        return "Ya existe una persona con este email, DNI o telefono"
+    return f"El horario {valores['hora'].strftime('%H:%M')} del día {valores['fecha']} ya está ocupado"
+
+
+def _insertar_por_fila(db: Session, modelo, filas_validas: list, errores: list):
+    # el lote fallo por alguna fila (por ejemplo un duplicado cargado en el medio por otro request):
+    # se reintenta fila por fila con un SAVEPOINT cada una, asi solo se informan las que fallan
+    insertadas = 0
+    for numero_fila, valores in filas_validas:
+        try:
+            with db.begin_nested():
+                db.execute(insert(modelo), valores)
+            insertadas += 1
+        except IntegrityError:
+            errores.append({"fila": numero_fila, "error": _error_insercion(modelo, valores)})
+
+    db.commit()
+    return insertadas
+
+
+def importar_personas(db: Session, filas, tamanio_lote: int = TAMANIO_LOTE_IMPORTACION):
+    return cargar_personas(db, validar_personas(list(filas)), tamanio_lote)
+
+
+def cargar_personas(db: Session, validadas, tamanio_lote: int = TAMANIO_LOTE_IMPORTACION):
+    # validadas: (procesadas, candidatas, errores) de validar_personas
+    procesadas, filas_candidatas, errores = validadas
+    errores = list(errores)
+    insertadas = 0
+    # valores unicos ya usados en esta carga (para duplicados entre filas del mismo archivo)
+    vistos = {"email": set(), "dni": set(), "telefono": set()}
+
+    for candidatas in en_lotes(filas_candidatas, tamanio_lote):
+        # una sola consulta por lote para los duplicados contra la base
+        existentes = {"email": set(), "dni": set(), "telefono": set()}
+        if candidatas:
+            for email, dni, telefono in db.query(Persona.email, Persona.dni, Persona.telefono).filter(or_(
+                Persona.email.in_([valores["email"] for _, valores in candidatas]),
+                Persona.dni.in_([valores["dni"] for _, valores in candidatas]),
+                Persona.telefono.in_([valores["telefono"] for _, valores in candidatas])
+            )):
+                existentes["email"].add(email)
+                existentes["dni"].add(dni)
+                existentes["telefono"].add(telefono)
+
+        filas_validas = []
+        for numero_fila, valores in candidatas:
+            repetido = next((campo for campo in vistos if valores[campo] in existentes[campo] or valores[campo] in vistos[campo]), None)
+            if repetido:
+                errores.append({"fila": numero_fila, "error": f"Ya existe una persona con este {repetido}"})
+                continue
+
+            for campo in vistos:
+                vistos[campo].add(valores[campo])
+            filas_validas.append((numero_fila, valores))
+
+        insertadas += _insertar_lote(db, Persona, filas_validas, errores)
+
+    return {"procesadas": procesadas, "insertadas": insertadas, "errores": sorted(errores, key=lambda error: error["fila"])}
+
+
+def importar_turnos(db: Session, filas, tamanio_lote: int = TAMANIO_LOTE_IMPORTACION):
+    return cargar_turnos(db, validar_turnos(list(filas)), tamanio_lote)
+
+
+def cargar_turnos(db: Session, validadas, tamanio_lote: int = TAMANIO_LOTE_IMPORTACION):
+    # carga de turnos historicos: no se valida que la fecha sea futura
+    # validadas: (procesadas, candidatas, errores) de validar_turnos
+    procesadas, filas_candidatas, errores = validadas
+    errores = list(errores)
+    insertadas = 0
+    horarios_tomados = set()
+
+    for candidatas in en_lotes(filas_candidatas, tamanio_lote):
+        # personas y recursos existentes y horarios ocupados del lote, una consulta (por lotes de IN) para cada cosa
+        ids_personas = list({valores["persona_id"] for _, valores in candidatas})
+        personas_existentes = set()
+        for ids in en_lotes(ids_personas, TAMANIO_LOTE_CONSULTAS):
+            personas_existentes.update(persona_id for (persona_id,) in db.query(Persona.id).filter(Persona.id.in_(ids)))
+
+        ids_recursos = list({valores["recurso_id"] for _, valores in candidatas})
+        recursos_existentes = set()
+        for ids in en_lotes(ids_recursos, TAMANIO_LOTE_CONSULTAS):
+            recursos_existentes.update(recurso_id for (recurso_id,) in db.query(Recurso.id).filter(Recurso.id.in_(ids)))
+
+        fechas = list({valores["fecha"] for _, valores in candidatas if valores["estado"] != ESTADO_CANCELADO})
+        for lote_fechas in en_lotes(fechas, TAMANIO_LOTE_CONSULTAS):
+            horarios_tomados.update(db.query(Turno.recurso_id, Turno.fecha, Turno.hora).filter(
+                Turno.fecha.in_(lote_fechas),
+                Turno.estado != ESTADO_CANCELADO
+            ).all())
+
+        filas_validas = []
+        for numero_fila, valores in candidatas:
+            if valores["persona_id"] not in personas_existentes:
+                errores.append({"fila": numero_fila, "error": "Persona no encontrada"})
+                continue
+
+            if valores["recurso_id"] not in recursos_existentes:
+                errores.append({"fila": numero_fila, "error": "Recurso no encontrado"})
+                continue
+
+            if valores["estado"] != ESTADO_CANCELADO:
+                horario = (valores["recurso_id"], valores["fecha"], valores["hora"])
+                if horario in horarios_tomados:
+                    errores.append({"fila": numero_fila, "error": f"El horario {valores['hora'].strftime('%H:%M')} del día {valores['fecha']} ya está ocupado"})
+                    continue
+                horarios_tomados.add(horario)
+
+            filas_validas.append((numero_fila, valores))
+
+        insertadas += _insertar_lote(db, Turno, filas_validas, errores)
+
+    # los turnos cargados cambian la disponibilidad y las cancelaciones, se vuelven a leer de la base
+    if insertadas:
+        limpiar_cache_disponibilidad()
+        limpiar_cache_cancelaciones()
+
+    return {"procesadas": procesadas, "insertadas": insertadas, "errores": sorted(errores, key=lambda error: error["fila"])}
@@ -0,0 +1,97 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from sqlalchemy import event
+
+from .config import LOG_NIVEL, LOG_ARCHIVO, LOG_SQL_LENTO_MS, LOG_SQL_MUESTREO
+
+
+logger = logging.getLogger("App")
+logger_sql = logging.getLogger("App.sql")
+
+_listener = None
+
+# campos propios de LogRecord, todo lo demas viene de extra={...}
+_CAMPOS_RECORD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class FormatoJSON(logging.Formatter):
+    # una linea JSON por evento, con los campos pasados en extra={...}
+    def format(self, record: logging.LogRecord):
+        datos = {
+            "momento": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        datos.update({clave: valor for clave, valor in vars(record).items() if clave not in _CAMPOS_RECORD})
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar_logs():
+    global _listener
+
+    if _listener is not None:
+        return
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if LOG_ARCHIVO:
+        handlers.append(logging.FileHandler(LOG_ARCHIVO, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(FormatoJSON())
+
+    # los requests solo encolan el registro, la escritura la hace el hilo del QueueListener
+    cola = queue.SimpleQueue()
+    _listener = QueueListener(cola, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logs)
+
+    logger.handlers = [QueueHandler(cola)]
+    logger.setLevel(LOG_NIVEL)
+    logger.propagate = False
+
+
+def detener_logs():
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def registrar_log_sql_lento(engine):
+    # en lugar de echo=True (que escribe todas las sentencias) solo se loguean las que superan
+    # LOG_SQL_LENTO_MS, y de esas una fraccion LOG_SQL_MUESTREO
+    @event.listens_for(engine, "before_cursor_execute")
+    def antes_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        # una conexion ejecuta una sentencia a la vez, alcanza con guardar un solo inicio
+        conexion.info["inicio_consulta"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def despues_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        inicio = conexion.info.pop("inicio_consulta", None)
+        if inicio is None:
+            return
+
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        if duracion_ms < LOG_SQL_LENTO_MS or random.random() >= LOG_SQL_MUESTREO:
+            return
+
+        logger_sql.warning(
+            "consulta lenta",
+            extra={
+                "duracion_ms": round(duracion_ms, 2),
+                "sentencia": sentencia,
+                "filas": cursor.rowcount,
+                "executemany": executemany,
+            },
+        )
@@ -1,20 +1,39 @@
-from datetime import date, datetime
-from fastapi import FastAPI, Request, Depends
-
-from .config import LIMIT_PAGINACION_DEFAULT
-from .crudPersonas import obtener_todas_personas, crear_persona, actualizar_persona, buscar_persona
-from .crudTurnos import (cancelar_turno, confirmar_turno, crear_turno, eliminar_turno, listar_turnos, 
-                        actualizar_turno, buscar_turno, obtener_turnos_disponibles, 
-                        obtener_turnos_por_fecha_con_persona, obtener_turnos_cancelados_mes_actual, 
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from .config import LIMIT_PAGINACION_DEFAULT, LIMITE_LISTADO_DEFAULT
+from .crudPersonas import obtener_todas_personas, crear_persona, actualizar_persona, buscar_persona, eliminar_persona, cache_personas
+from .crudRecursos import crear_recurso, listar_recursos, actualizar_recurso, buscar_recurso
+from .crudTurnos import (cancelar_turno, confirmar_turno, cambiar_estado_turnos, crear_turno, eliminar_turno, listar_turnos, 
+                        actualizar_turno, buscar_turno, obtener_turnos_disponibles, obtener_turnos_disponibles_rango, 
+                        obtener_recursos_libres,
+                        obtener_turnos_por_fecha_con_persona, obtener_cancelaciones_por_mes, 
                         obtener_turnos_por_persona, obtener_personas_con_turnos_cancelados, 
-                        obtener_turnos_confirmados_periodo, obtener_personas_por_estado)
-from .database import Base, engine
-from .models import Turno
-from .schemas import actualizar_turno_base, turno_base
-from .utils import get_db, calcular_edad, validar_formato_fecha
+                        obtener_turnos_confirmados_periodo, obtener_personas_por_estado,
+                        consulta_turnos_por_fecha, consulta_cancelaciones_por_mes, consulta_turnos_cancelados,
+                        consulta_turnos_por_persona, consulta_personas_con_turnos_cancelados,
+                        consulta_turnos_confirmados, consulta_personas_por_estado, cache_turnos)
+from .analitica import turnos_por_dia_y_estado, tasa_cancelacion_por_persona, ocupacion_por_horario
+from .cancelaciones import reconstruir_cancelaciones
+from .database import Base, engine, engine_async, metricas_pool, metricas_pool_async
+from .exportacion import validar_formato_exportacion, respuesta_reporte, detener_pool_pdf
+from .importacion import preparar_importacion, validar_personas, validar_turnos, cargar_personas, cargar_turnos
+from .logs import configurar_logs, detener_logs, logger
+from .migraciones import aplicar_migraciones
+from .respuestasCondicionales import respuestas_condicionales, metricas_respuestas
+from .schemas import (actualizar_turno_base, turno_base, cambio_estado_turnos, respuesta_cambio_estado,
+                      recurso_base, actualizar_recurso_base, recurso_respuesta,
+                      listado_turnos, listado_personas, reporte_estado_personas)
+from .utils import get_sesion, ejecutar, normalizar_email, calcular_edad, validar_formato_fecha, validar_limite
 
 
 app = FastAPI(title="SL-UNLA-LAB-2025-GRUPO-03-API")
+app.middleware("http")(respuestas_condicionales)
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
+         "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
 
 
 @app.get("/")
@@ -24,58 +43,95 @@ def inicio():
 
 @app.on_event("startup")
 def al_iniciar():
+    configurar_logs()
+
     Base.metadata.create_all(bind=engine)
+    # create_all no toca tablas existentes, los cambios de esquema se aplican con las migraciones
+    for migracion in aplicar_migraciones(engine):
+        logger.info("migracion aplicada", extra={"migracion": migracion})
+
+
+@app.on_event("shutdown")
+def al_detener():
+    detener_pool_pdf()
+    detener_logs()
+
+
+@app.get("/metricas/pool")
+def metricas_pool_endpoint():
+    """Uso y tiempos de espera del pool de conexiones, para dimensionar workers y pool_size"""
+    metricas = {"sync": metricas_pool.resumen(engine.pool)}
+    if engine_async is not None:
+        metricas["async"] = metricas_pool_async.resumen(engine_async.sync_engine.pool)
+
+    return metricas
+
 
+@app.get("/metricas/cache")
+def metricas_cache_endpoint():
+    """Aciertos, fallos e invalidaciones de las caches de buscar_persona y buscar_turno, y uso de la cache de respuestas (de este proceso)"""
+    return {"personas": cache_personas.metricas(), "turnos": cache_turnos.metricas(), "respuestas": metricas_respuestas()}
+
+
+@app.post("/mantenimiento/reconstruir-cancelaciones")
+async def reconstruir_cancelaciones_endpoint(db = Depends(get_sesion)):
+    """Recalcula desde turnos las cancelaciones recientes por persona que se guardan en memoria"""
+    return await ejecutar(db, reconstruir_cancelaciones)
+
+
+# Todos los endpoints que usan la base son async: las funciones de los crud se llaman con
+# ejecutar(), que segun USAR_SESION_ASYNC usa la AsyncSession o manda la Session sync al threadpool
 
 # Endpoints Turnos
 @app.post("/turnos")
-def crear_turno_endpoint(turno_data: turno_base, db = Depends(get_db)):
+async def crear_turno_endpoint(turno_data: turno_base, db = Depends(get_sesion)):
 
-    nuevo_turno = crear_turno(db, turno_data)
+    nuevo_turno = await ejecutar(db, crear_turno, turno_data)
 
     return {
         "id": nuevo_turno.id,
         "persona_id": nuevo_turno.persona_id,
+        "recurso_id": nuevo_turno.recurso_id,
         "fecha": str(nuevo_turno.fecha),
         "hora": str(nuevo_turno.hora),
         "estado": nuevo_turno.estado
     }
 
-@app.get("/turnos")
-def listar_turnos_endpoint(db = Depends(get_db)):
+@app.get("/turnos", response_model=listado_turnos)
+async def listar_turnos_endpoint(cursor: Optional[str] = None, limite: int = LIMITE_LISTADO_DEFAULT,
+                                 fecha: Optional[str] = None, estado: Optional[str] = None,
+                                 persona_id: Optional[int] = None, recurso_id: Optional[int] = None,
+                                 db = Depends(get_sesion)):
+    """Listado de turnos paginado por cursor: siguiente_cursor se manda como cursor para pedir la pagina siguiente"""
+    if fecha is not None:
+        validar_formato_fecha(fecha)
+        fecha = date.fromisoformat(fecha)
 
-    turnos = listar_turnos(db)
+    turnos, siguiente_cursor = await ejecutar(db, listar_turnos, cursor, limite, fecha, estado, persona_id, recurso_id)
 
-    return [
-        {
-            "id": t.id,
-            "persona_id": t.persona_id,
-            "fecha": str(t.fecha),
-            "hora": str(t.hora),
-            "estado": t.estado
-        }
-        for t in turnos
-    ]
+    return {"turnos": turnos, "siguiente_cursor": siguiente_cursor}
 
 @app.get("/turnos/{id}")
-def obtener_turno(id: int, db = Depends(get_db)):
-    turno = buscar_turno(db, id)
+async def obtener_turno(id: int, db = Depends(get_sesion)):
+    turno = await ejecutar(db, buscar_turno, id)
     return {
         "id": turno.id,
         "persona_id": turno.persona_id,
+        "recurso_id": turno.recurso_id,
         "fecha": str(turno.fecha),
         "hora": str(turno.hora),
         "estado": turno.estado
     }
 
 @app.put("/turnos/{id}")
-def actualizar_turno_endpoint(id: int, turno_data: actualizar_turno_base, db = Depends(get_db)):
+async def actualizar_turno_endpoint(id: int, turno_data: actualizar_turno_base, db = Depends(get_sesion)):
     
-    turno = actualizar_turno(db, id, turno_data)
+    turno = await ejecutar(db, actualizar_turno, id, turno_data)
     
     return {
         "id": turno.id,
         "persona_id": turno.persona_id,
+        "recurso_id": turno.recurso_id,
         "fecha": str(turno.fecha),
         "hora": str(turno.hora),
         "estado": turno.estado
@@ -83,9 +139,9 @@ def actualizar_turno_endpoint(id: int, turno_data: actualizar_turno_base, db = D
 
 @app.delete("/turnos/{id}")
 
-def eliminar_turno_endpoint(id: int, db = Depends(get_db)):
+async def eliminar_turno_endpoint(id: int, db = Depends(get_sesion)):
 
-    eliminar_turno(db, id)
+    await ejecutar(db, eliminar_turno, id)
 
     return {"ok": True, "mensaje": "Turno eliminado"}
 
@@ -93,11 +149,10 @@ def eliminar_turno_endpoint(id: int, db = Depends(get_db)):
 
 # Endpoint - Cálculo de turnos disponibles
 @app.get("/turnos-disponibles")
-def obtener_turnos_disponibles_endpoint(fecha: str):
-    db = next(get_db())
+async def obtener_turnos_disponibles_endpoint(fecha: str, recurso_id: Optional[int] = None, db = Depends(get_sesion)):
 
     validar_formato_fecha(fecha)    
-    turnos_disponibles = obtener_turnos_disponibles(db, date.fromisoformat(fecha))
+    turnos_disponibles = await ejecutar(db, obtener_turnos_disponibles, date.fromisoformat(fecha), recurso_id)
 
     #respuesta del Endpoint
     return {
@@ -105,10 +160,55 @@ def obtener_turnos_disponibles_endpoint(fecha: str):
         "horarios_disponibles": turnos_disponibles
     } 
 
+
+@app.get("/turnos-disponibles/rango")
+async def obtener_turnos_disponibles_rango_endpoint(desde: str, hasta: str, primeros: Optional[int] = None,
+                                                    recurso_id: Optional[int] = None, db = Depends(get_sesion)):
+    """Horarios disponibles de cada dia entre desde y hasta (o solo los primeros N libres)"""
+    validar_formato_fecha(desde)
+    validar_formato_fecha(hasta)
+
+    dias = await ejecutar(db, obtener_turnos_disponibles_rango, date.fromisoformat(desde), date.fromisoformat(hasta),
+                          primeros, recurso_id)
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "dias": [
+            {
+                "fecha": str(fecha),
+                "horarios_disponibles": horarios
+            }
+            for fecha, horarios in dias
+        ]
+    }
+
+@app.get("/turnos-disponibles/recursos")
+async def obtener_recursos_libres_endpoint(desde: str, hasta: Optional[str] = None, db = Depends(get_sesion)):
+    """Horarios de cada dia con al menos un recurso libre, con la cantidad de recursos libres en cada uno"""
+    validar_formato_fecha(desde)
+    if hasta is None:
+        hasta = desde
+    validar_formato_fecha(hasta)
+
+    dias = await ejecutar(db, obtener_recursos_libres, date.fromisoformat(desde), date.fromisoformat(hasta))
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "dias": [
+            {
+                "fecha": str(fecha),
+                "horarios": [{"hora": hora, "recursos_libres": libres} for hora, libres in horarios]
+            }
+            for fecha, horarios in dias
+        ]
+    }
+
 @app.put("/turnos/{turno_id}/cancelar")
-def cancelar_turno_endpoint(turno_id: int, db = Depends(get_db)):
+async def cancelar_turno_endpoint(turno_id: int, db = Depends(get_sesion)):
     
-    turno_cancelado = cancelar_turno(db, turno_id)
+    turno_cancelado = await ejecutar(db, cancelar_turno, turno_id)
         
     return {
         "id": turno_cancelado.id,
@@ -119,9 +219,9 @@ def cancelar_turno_endpoint(turno_id: int, db = Depends(get_db)):
     
 
 @app.put("/turnos/{turno_id}/confirmar")
-def confirmar_turno_endpoint(turno_id: int, db = Depends(get_db)):
+async def confirmar_turno_endpoint(turno_id: int, db = Depends(get_sesion)):
         
-    turno_confirmado = confirmar_turno(db, turno_id)
+    turno_confirmado = await ejecutar(db, confirmar_turno, turno_id)
     
     return {
         "id": turno_confirmado.id,
@@ -131,15 +231,20 @@ def confirmar_turno_endpoint(turno_id: int, db = Depends(get_db)):
     }
 
 
+@app.post("/turnos/estado", response_model=respuesta_cambio_estado, response_model_exclude_none=True)
+async def cambiar_estado_turnos_endpoint(cambio: cambio_estado_turnos, db = Depends(get_sesion)):
+    """Confirma, cancela o marca asistencia de varios turnos en una transaccion, con el resultado de cada uno"""
+    return await ejecutar(db, cambiar_estado_turnos, cambio.ids, cambio.estado)
+
+
 # Endpoints Personas
 
 @app.post("/personas")
-#el async def es necesario por que uso el await mas abajo
-async def crear_persona_endpoint(request: Request):
+async def crear_persona_endpoint(request: Request, db = Depends(get_sesion)):
     datos = await request.json()
-    db = next(get_db())
+    await normalizar_email(datos)
 
-    nueva_persona = crear_persona(db, datos)
+    nueva_persona = await ejecutar(db, crear_persona, datos)
     
     edad = calcular_edad(nueva_persona.fecha_nacimiento)
     
@@ -155,29 +260,18 @@ async def crear_persona_endpoint(request: Request):
     }
 
 
-@app.get("/personas")
-def listar_personas():
-    db = next(get_db())
-    personas = obtener_todas_personas(db)
-    return [
-        {
-            "id": p.id,
-            "nombre": p.nombre,
-            "email": p.email,
-            "dni": p.dni,
-            "telefono": p.telefono,
-            "fecha_nacimiento": str(p.fecha_nacimiento),
-            "edad": calcular_edad(p.fecha_nacimiento),
-            "habilitado": p.habilitado
-        }
-        for p in personas
-    ]
+@app.get("/personas", response_model=listado_personas)
+async def listar_personas(cursor: Optional[str] = None, limite: int = LIMITE_LISTADO_DEFAULT,
+                          habilitado: Optional[bool] = None, db = Depends(get_sesion)):
+    """Listado de personas paginado por cursor, igual que /turnos"""
+    personas, siguiente_cursor = await ejecutar(db, obtener_todas_personas, cursor, limite, habilitado)
+
+    return {"personas": personas, "siguiente_cursor": siguiente_cursor}
 
 
 @app.get("/personas/{id}")
-def obtener_persona(id: int):
-    db = next(get_db())
-    persona = buscar_persona(db, id)
+async def obtener_persona(id: int, db = Depends(get_sesion)):
+    persona = await ejecutar(db, buscar_persona, id)
     
     edad = calcular_edad(persona.fecha_nacimiento)
     
@@ -194,10 +288,10 @@ def obtener_persona(id: int):
 
 
 @app.put("/personas/{id}")
-async def actualizar_persona_endpoint(id: int, request: Request):
+async def actualizar_persona_endpoint(id: int, request: Request, db = Depends(get_sesion)):
     datos = await request.json()
-    db = next(get_db())
-    persona = actualizar_persona(db, id, datos)
+    await normalizar_email(datos)
+    persona = await ejecutar(db, actualizar_persona, id, datos)
     edad = calcular_edad(persona.fecha_nacimiento)
     
     return {
@@ -213,12 +307,8 @@ async def actualizar_persona_endpoint(id: int, request: Request):
 
 
 @app.delete("/personas/{id}")
-def eliminar_persona(id: int):
-    db = next(get_db())
-    persona = buscar_persona(db, id)
-    
-    # Verificar si la persona tiene turnos asociados
-    turnos_asociados = db.query(Turno).filter(Turno.persona_id == id).count()
+async def eliminar_persona_endpoint(id: int, db = Depends(get_sesion)):
+    turnos_asociados = await ejecutar(db, eliminar_persona, id)
     
     if turnos_asociados > 0:
         return {
@@ -226,19 +316,63 @@ def eliminar_persona(id: int):
             "mensaje": f"No se puede eliminar la persona porque tiene {turnos_asociados} turno(s) asociado(s). Primero elimine o cancele los turnos."
         }
 
-    db.delete(persona)
-    db.commit()
     return {"ok": True, "mensaje": "Persona eliminada"}
 
 
+# Endpoints Recursos (profesionales, salas)
+
+@app.post("/recursos", response_model=recurso_respuesta)
+async def crear_recurso_endpoint(datos: recurso_base, db = Depends(get_sesion)):
+    return await ejecutar(db, crear_recurso, datos)
+
+
+@app.get("/recursos", response_model=list[recurso_respuesta])
+async def listar_recursos_endpoint(activo: Optional[bool] = None, db = Depends(get_sesion)):
+    return await ejecutar(db, listar_recursos, activo)
+
+
+@app.get("/recursos/{id}", response_model=recurso_respuesta)
+async def obtener_recurso(id: int, db = Depends(get_sesion)):
+    return await ejecutar(db, buscar_recurso, id)
+
+
+@app.put("/recursos/{id}", response_model=recurso_respuesta)
+async def actualizar_recurso_endpoint(id: int, datos: actualizar_recurso_base, db = Depends(get_sesion)):
+    return await ejecutar(db, actualizar_recurso, id, datos)
+
+
+# Importacion masiva
+@app.post("/importar/personas")
+async def importar_personas_endpoint(request: Request, formato: str = "csv", db = Depends(get_sesion)):
+    """Carga masiva de personas desde un CSV (con encabezado) o NDJSON enviado como cuerpo del request"""
+    # leer y validar las filas no usa la base, va al threadpool; con ejecutar solo se hace la carga
+    validadas = await run_in_threadpool(preparar_importacion, await request.body(), formato, validar_personas)
+
+    return await ejecutar(db, cargar_personas, validadas)
+
+
+@app.post("/importar/turnos")
+async def importar_turnos_endpoint(request: Request, formato: str = "csv", db = Depends(get_sesion)):
+    """Carga masiva de turnos (persona_id, fecha, hora, estado y recurso_id opcional) desde un CSV o NDJSON"""
+    validadas = await run_in_threadpool(preparar_importacion, await request.body(), formato, validar_turnos)
+
+    return await ejecutar(db, cargar_turnos, validadas)
+
+
 # endpoints de reportes
+# todos aceptan formato=csv|ndjson para descargar el reporte en streaming (una fila por linea) o formato=pdf,
+# con formato=json (por defecto) responden igual que siempre
 @app.get("/reportes/turnos-por-fecha")
-def reporte_turnos_por_fecha(fecha: str, db = Depends(get_db)):
+async def reporte_turnos_por_fecha(fecha: str, formato: str = "json", db = Depends(get_sesion)):
     """Reporte de turnos para una fecha específica"""
     validar_formato_fecha(fecha)
+    validar_formato_exportacion(formato)
     fecha_obj = date.fromisoformat(fecha)
+
+    if formato != "json":
+        return await respuesta_reporte(formato, f"turnos-{fecha}", consulta_turnos_por_fecha, fecha_obj)
     
-    turnos = obtener_turnos_por_fecha_con_persona(db, fecha_obj)
+    turnos = await ejecutar(db, obtener_turnos_por_fecha_con_persona, fecha_obj)
     
     return [
         {
@@ -256,45 +390,71 @@ def reporte_turnos_por_fecha(fecha: str, db = Depends(get_db)):
     ]
 
 
+def periodo_reporte(desde: Optional[str], hasta: Optional[str]):
+    # sin desde/hasta el periodo es el mes actual
+    hoy = date.today()
+    primer_dia_mes = hoy.replace(day=1)
+    primer_dia_mes_siguiente = (primer_dia_mes + timedelta(days=32)).replace(day=1)
+
+    if desde is not None:
+        validar_formato_fecha(desde)
+    if hasta is not None:
+        validar_formato_fecha(hasta)
+
+    fecha_desde = date.fromisoformat(desde) if desde else primer_dia_mes
+    fecha_hasta = date.fromisoformat(hasta) if hasta else primer_dia_mes_siguiente - timedelta(days=1)
+
+    return fecha_desde, fecha_hasta
+
+
 @app.get("/reportes/turnos-cancelados-por-mes")
-def reporte_turnos_cancelados_mes(db = Depends(get_db)):
-    """Reporte de turnos cancelados del mes actual con GROUP BY"""
-    turnos = obtener_turnos_cancelados_mes_actual(db)
-    fecha_actual = datetime.now()
-    meses = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
-             "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
-    
-    # Si hay resultados, tomar el primer grupo (debería ser solo uno para el mes actual)
-    if turnos:
-        año, mes, cantidad, turno, persona = turnos[0]
-        return {
-            "anio": int(año),
-            "mes": meses[int(mes) - 1],
-            "cantidad": cantidad,
-            "turnos": [
-                {
-                    "id": t.id,
-                    "persona_id": t.persona_id,
-                    "fecha": str(t.fecha),
-                    "hora": str(t.hora),
-                    "estado": t.estado
-                }
-                for año, mes, cantidad, t, p in turnos
-            ]
-        }
-    else:
-        return {
-            "anio": fecha_actual.year,
-            "mes": meses[fecha_actual.month - 1],
-            "cantidad": 0,
-            "turnos": []
-        }
+async def reporte_turnos_cancelados_mes(desde: Optional[str] = None, hasta: Optional[str] = None, formato: str = "json", db = Depends(get_sesion)):
+    """Reporte de cantidad de turnos cancelados por mes entre desde y hasta (por defecto el mes actual)"""
+    fecha_desde, fecha_hasta = periodo_reporte(desde, hasta)
+    validar_formato_exportacion(formato)
+
+    if fecha_desde > fecha_hasta:
+        return {"error": "La fecha 'desde' debe ser anterior a la fecha 'hasta'"}
+
+    if formato != "json":
+        # en CSV/NDJSON solo van los meses con cancelaciones (numero de mes en lugar del nombre)
+        return await respuesta_reporte(formato, f"cancelados-por-mes-{fecha_desde}-{fecha_hasta}", consulta_cancelaciones_por_mes, fecha_desde, fecha_hasta)
+
+    meses = await ejecutar(db, obtener_cancelaciones_por_mes, fecha_desde, fecha_hasta)
+
+    return {
+        "desde": str(fecha_desde),
+        "hasta": str(fecha_hasta),
+        "cantidad": sum(cantidad for _, _, cantidad in meses),
+        "meses": [
+            {
+                "anio": anio,
+                "mes": MESES[mes - 1],
+                "cantidad": cantidad
+            }
+            for anio, mes, cantidad in meses
+        ]
+    }
+
+
+@app.get("/reportes/turnos-cancelados-por-mes/detalle")
+async def reporte_turnos_cancelados_detalle(desde: Optional[str] = None, hasta: Optional[str] = None, formato: str = "ndjson"):
+    """Turnos cancelados entre desde y hasta, en streaming como NDJSON (una linea JSON por turno) o CSV"""
+    fecha_desde, fecha_hasta = periodo_reporte(desde, hasta)
+    validar_formato_exportacion(formato, ("csv", "ndjson"))
+
+    return await respuesta_reporte(formato, f"cancelados-{fecha_desde}-{fecha_hasta}", consulta_turnos_cancelados, fecha_desde, fecha_hasta)
 
 
 @app.get("/reportes/turnos-por-persona")
-def reporte_turnos_por_persona(dni: str, db = Depends(get_db)):
+async def reporte_turnos_por_persona(dni: str, formato: str = "json", db = Depends(get_sesion)):
     """Reporte de turnos de una persona especifica"""
-    turnos = obtener_turnos_por_persona(db, dni)
+    validar_formato_exportacion(formato)
+
+    if formato != "json":
+        return await respuesta_reporte(formato, f"turnos-persona-{dni}", consulta_turnos_por_persona, dni)
+
+    turnos = await ejecutar(db, obtener_turnos_por_persona, dni)
     
     if not turnos:
         return {"mensaje": f"No se encontraron turnos para la persona con DNI {dni}"}
@@ -321,20 +481,28 @@ def reporte_turnos_por_persona(dni: str, db = Depends(get_db)):
 
 
 @app.get("/reportes/turnos-cancelados")
-def reporte_personas_con_turnos_cancelados(min: int = 5, db = Depends(get_db)):
-    """Reporte de personas con al menos min turnos cancelados"""
-    personas = obtener_personas_con_turnos_cancelados(db, min)
+async def reporte_personas_con_turnos_cancelados(min: int = 5, solo_cantidades: bool = False, formato: str = "json", db = Depends(get_sesion)):
+    """Reporte de personas con al menos min turnos cancelados (solo_cantidades=true omite el detalle de turnos)"""
+    validar_formato_exportacion(formato)
+
+    if formato != "json":
+        return await respuesta_reporte(formato, "personas-con-cancelados", consulta_personas_con_turnos_cancelados, min, solo_cantidades)
+
+    personas = await ejecutar(db, obtener_personas_con_turnos_cancelados, min, solo_cantidades)
     
-    return [
-        {
+    resultado = []
+    for item in personas:
+        fila = {
             "persona": {
                 "id": item['persona'].id,
                 "nombre": item['persona'].nombre,
                 "dni": item['persona'].dni,
                 "email": item['persona'].email
             },
-            "cantidad_cancelados": item['cantidad_cancelados'],
-            "turnos_cancelados": [
+            "cantidad_cancelados": item['cantidad_cancelados']
+        }
+        if not solo_cantidades:
+            fila["turnos_cancelados"] = [
                 {
                     "id": turno.id,
                     "fecha": str(turno.fecha),
@@ -343,32 +511,42 @@ def reporte_personas_con_turnos_cancelados(min: int = 5, db = Depends(get_db)):
                 }
                 for turno in item['turnos_cancelados']
             ]
-        }
-        for item in personas
-    ]
+        resultado.append(fila)
+
+    return resultado
 
 
 @app.get("/reportes/turnos-confirmados")
-def reporte_turnos_confirmados(desde: str, hasta: str, pagina: int = 1, db = Depends(get_db)):
-    """Reporte de turnos confirmados en un periodo con paginacion"""
+async def reporte_turnos_confirmados(desde: str, hasta: str, cursor: Optional[str] = None, limite: int = LIMIT_PAGINACION_DEFAULT,
+                                     formato: str = "json", pagina: Optional[int] = None, db = Depends(get_sesion)):
+    """Reporte de turnos confirmados en un periodo, paginado por cursor (siguiente_cursor)"""
+    # pagina era la paginacion anterior: se rechaza en vez de ignorarla, si no el cliente recibe siempre la primera
+    if pagina is not None:
+        raise HTTPException(status_code=400, detail="El parametro pagina ya no se usa: pedir la pagina siguiente con cursor=siguiente_cursor de la respuesta anterior")
+
     validar_formato_fecha(desde)
     validar_formato_fecha(hasta)
+    validar_formato_exportacion(formato)
     
     fecha_desde = date.fromisoformat(desde)
     fecha_hasta = date.fromisoformat(hasta)
     
     if fecha_desde > fecha_hasta:
         return {"error": "La fecha 'desde' debe ser anterior a la fecha 'hasta'"}
+
+    # la exportacion trae el periodo completo, sin paginar
+    if formato != "json":
+        return await respuesta_reporte(formato, f"confirmados-{desde}-{hasta}", consulta_turnos_confirmados, fecha_desde, fecha_hasta)
     
-    offset = (pagina - 1) * LIMIT_PAGINACION_DEFAULT
-    turnos, total = obtener_turnos_confirmados_periodo(db, fecha_desde, fecha_hasta, offset, LIMIT_PAGINACION_DEFAULT)
+    turnos, total, siguiente_cursor = await ejecutar(db, obtener_turnos_confirmados_periodo, fecha_desde, fecha_hasta, cursor, limite)
     
-    total_paginas = (total + LIMIT_PAGINACION_DEFAULT - 1) // LIMIT_PAGINACION_DEFAULT  # Redondeo hacia arriba
+    total_paginas = (total + limite - 1) // limite  # Redondeo hacia arriba
     
     return {
-        "pagina_actual": pagina,
+        "limite": limite,
         "total_paginas": total_paginas,
         "total_registros": total,
+        "siguiente_cursor": siguiente_cursor,
         "turnos": [
             {
                 "id": turno.id,
@@ -386,24 +564,62 @@ def reporte_turnos_confirmados(desde: str, hasta: str, pagina: int = 1, db = Dep
     }
 
 
-@app.get("/reportes/estado-personas")
-def reporte_estado_personas(habilitada: bool, db = Depends(get_db)):
+@app.get("/reportes/estado-personas", response_model=reporte_estado_personas)
+async def reporte_estado_personas_endpoint(habilitada: bool, formato: str = "json", db = Depends(get_sesion)):
     """Reporte de personas habilitadas o inhabilitadas para sacar turnos"""
-    personas = obtener_personas_por_estado(db, habilitada)
+    validar_formato_exportacion(formato)
+
+    if formato != "json":
+        return await respuesta_reporte(formato, f"personas-{'habilitadas' if habilitada else 'inhabilitadas'}", consulta_personas_por_estado, habilitada)
+
+    personas = await ejecutar(db, obtener_personas_por_estado, habilitada)
     
     estado_texto = "habilitadas" if habilitada else "inhabilitadas"
     
     return {
         "estado": estado_texto,
         "cantidad": len(personas),
-        "personas": [
-            {
-                "id": persona.id,
-                "nombre": persona.nombre,
-                "dni": persona.dni,
-                "email": persona.email,
-                "habilitado": persona.habilitado
-            }
-            for persona in personas
-        ]
+        "personas": personas
     }
+
+
+# reportes de analitica: agregados sobre periodos largos, sin traer turnos ni personas completos
+@app.get("/reportes/analitica/turnos-por-dia")
+async def reporte_turnos_por_dia(desde: Optional[str] = None, hasta: Optional[str] = None, db = Depends(get_sesion)):
+    """Cantidad de turnos por dia y estado entre desde y hasta (por defecto el mes actual)"""
+    fecha_desde, fecha_hasta = periodo_reporte(desde, hasta)
+
+    if fecha_desde > fecha_hasta:
+        return {"error": "La fecha 'desde' debe ser anterior a la fecha 'hasta'"}
+
+    dias = await ejecutar(db, turnos_por_dia_y_estado, fecha_desde, fecha_hasta)
+
+    return {"desde": str(fecha_desde), "hasta": str(fecha_hasta), "dias": dias}
+
+
+@app.get("/reportes/analitica/tasa-cancelacion")
+async def reporte_tasa_cancelacion(desde: Optional[str] = None, hasta: Optional[str] = None, min_turnos: int = 1,
+                                   limite: int = LIMITE_LISTADO_DEFAULT, db = Depends(get_sesion)):
+    """Personas con mayor proporcion de turnos cancelados en el periodo (con al menos min_turnos turnos)"""
+    fecha_desde, fecha_hasta = periodo_reporte(desde, hasta)
+    validar_limite(limite)
+
+    if fecha_desde > fecha_hasta:
+        return {"error": "La fecha 'desde' debe ser anterior a la fecha 'hasta'"}
+
+    personas = await ejecutar(db, tasa_cancelacion_por_persona, fecha_desde, fecha_hasta, min_turnos, limite)
+
+    return {"desde": str(fecha_desde), "hasta": str(fecha_hasta), "cantidad": len(personas), "personas": personas}
+
+
+@app.get("/reportes/analitica/ocupacion-por-horario")
+async def reporte_ocupacion_por_horario(desde: Optional[str] = None, hasta: Optional[str] = None, db = Depends(get_sesion)):
+    """Turnos tomados y cancelados por horario, y proporcion de dias del periodo en que estuvo ocupado"""
+    fecha_desde, fecha_hasta = periodo_reporte(desde, hasta)
+
+    if fecha_desde > fecha_hasta:
+        return {"error": "La fecha 'desde' debe ser anterior a la fecha 'hasta'"}
+
+    horarios = await ejecutar(db, ocupacion_por_horario, fecha_desde, fecha_hasta)
+
+    return {"desde": str(fecha_desde), "hasta": str(fecha_hasta), "horarios": horarios}
@@ -0,0 +1,87 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+
+
+class MetricasPool:
+    """Contadores del pool de conexiones para dimensionar workers y pool_size."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.conexiones_creadas = 0
+        self.conexiones_invalidadas = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.en_uso_max = 0
+        self._en_uso = 0
+
+    def registrar_espera(self, segundos: float, timeout: bool = False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+                return
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+
+    def _checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+            self._en_uso += 1
+            self.en_uso_max = max(self.en_uso_max, self._en_uso)
+
+    def _checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+            self._en_uso -= 1
+
+    def _connect(self, *args):
+        with self._lock:
+            self.conexiones_creadas += 1
+
+    def _invalidate(self, *args):
+        with self._lock:
+            self.conexiones_invalidadas += 1
+
+    def escuchar(self, engine):
+        event.listen(engine, "checkout", self._checkout)
+        event.listen(engine, "checkin", self._checkin)
+        event.listen(engine, "connect", self._connect)
+        event.listen(engine, "invalidate", self._invalidate)
+
+    def resumen(self, pool):
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "en_uso": pool.checkedout(),
+                "libres": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "en_uso_max": self.en_uso_max,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "conexiones_creadas": self.conexiones_creadas,
+                "conexiones_invalidadas": self.conexiones_invalidadas,
+                "timeouts": self.timeouts,
+                "espera_promedio_ms": round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+            }
+
+
+def crear_pool_con_metricas(clase_pool, metricas: MetricasPool):
+    # _do_get es el metodo que implementan los pools para entregar una conexion,
+    # el tiempo que tarda es la espera del checkout (incluye abrir una conexion nueva si hace falta)
+    class PoolConMetricas(clase_pool):
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                conexion = super()._do_get()
+            except TimeoutPool:
+                metricas.registrar_espera(time.perf_counter() - inicio, timeout=True)
+                raise
+            metricas.registrar_espera(time.perf_counter() - inicio)
+            return conexion
+
+    return PoolConMetricas
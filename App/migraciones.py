@@ -0,0 +1,117 @@
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .config import ESTADO_CANCELADO
+
+
+# create_all solo crea las tablas que no existen, no modifica las que ya estan en Database.db.
+# Por eso los cambios de esquema sobre tablas existentes se agregan aca como migraciones numeradas,
+# y en la tabla version_esquema queda guardada la ultima que se aplico.
+metadata_migraciones = MetaData()
+
+version_esquema = Table(
+    "version_esquema",
+    metadata_migraciones,
+    Column("version", Integer, nullable=False),
+)
+
+
+def migracion_001_indices_turnos(conexion: Connection):
+    # el DDL queda escrito aca (y no tomado de models.py) para que la migracion no cambie si cambia el modelo
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_turnos_fecha_estado_hora ON turnos (fecha, estado, hora)"
+    ))
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_turnos_persona_estado_fecha ON turnos (persona_id, estado, fecha)"
+    ))
+
+
+def migracion_002_turno_unico_por_horario(conexion: Connection):
+    # si la base ya tiene turnos duplicados el indice unico no se puede crear,
+    # no se cancela nada automaticamente: se informan los horarios para resolverlos a mano
+    duplicados = conexion.execute(text(
+        "SELECT fecha, hora, COUNT(*) FROM turnos WHERE estado != :cancelado "
+        "GROUP BY fecha, hora HAVING COUNT(*) > 1"
+    ), {"cancelado": ESTADO_CANCELADO}).all()
+
+    if duplicados:
+        detalle = ", ".join(f"{fecha} {hora} ({cantidad} turnos)" for fecha, hora, cantidad in duplicados)
+        raise RuntimeError(f"No se puede crear el indice unico de turnos, hay horarios con mas de un turno activo: {detalle}")
+
+    conexion.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_turnos_fecha_hora_activos ON turnos (fecha, hora) "
+        f"WHERE estado != '{ESTADO_CANCELADO}'"
+    ))
+
+
+def migracion_003_indice_fecha_con_persona(conexion: Connection):
+    # con persona_id al final el indice por fecha cubre tambien los reportes de analitica por persona
+    # (se leen del indice sin ir a la tabla), y sigue sirviendo para todo lo que usaba el anterior
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_turnos_fecha_estado_hora_persona ON turnos (fecha, estado, hora, persona_id)"
+    ))
+    conexion.execute(text("DROP INDEX IF EXISTS ix_turnos_fecha_estado_hora"))
+
+
+def migracion_004_recursos(conexion: Connection):
+    # los turnos pasan a ser de un recurso (profesional, sala...), los que ya existian quedan en el recurso 1
+    conexion.execute(text(
+        "CREATE TABLE IF NOT EXISTS recursos (id INTEGER NOT NULL PRIMARY KEY, nombre VARCHAR(100) NOT NULL UNIQUE, "
+        "tipo VARCHAR(50), activo BOOLEAN NOT NULL)"
+    ))
+    conexion.execute(text(
+        "INSERT INTO recursos (id, nombre, tipo, activo) SELECT 1, 'General', NULL, 1 "
+        "WHERE NOT EXISTS (SELECT 1 FROM recursos WHERE id = 1)"
+    ))
+
+    # en una base nueva create_all ya crea la columna. SQLite no deja agregar una columna con REFERENCES
+    # y default distinto de NULL con las foreign keys activas, asi que en las bases existentes va sin la FK
+    if "recurso_id" not in {columna["name"] for columna in inspect(conexion).get_columns("turnos")}:
+        conexion.execute(text("ALTER TABLE turnos ADD COLUMN recurso_id INTEGER NOT NULL DEFAULT 1"))
+
+    # el turno unico por horario pasa a ser por recurso
+    conexion.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_turnos_recurso_fecha_hora_activos ON turnos (recurso_id, fecha, hora) "
+        f"WHERE estado != '{ESTADO_CANCELADO}'"
+    ))
+    conexion.execute(text("DROP INDEX IF EXISTS ux_turnos_fecha_hora_activos"))
+
+
+# (version, descripcion, funcion) - siempre agregar al final con la version siguiente
+MIGRACIONES = [
+    (1, "indices compuestos en turnos", migracion_001_indices_turnos),
+    (2, "un solo turno activo por fecha y hora", migracion_002_turno_unico_por_horario),
+    (3, "indice por fecha de turnos con persona_id", migracion_003_indice_fecha_con_persona),
+    (4, "recursos y turno unico por recurso, fecha y hora", migracion_004_recursos),
+]
+
+
+def obtener_version_esquema(conexion: Connection):
+    version_esquema.create(conexion, checkfirst=True)
+
+    version = conexion.execute(select(version_esquema.c.version)).scalar()
+    if version is None:
+        conexion.execute(version_esquema.insert().values(version=0))
+        version = 0
+
+    return version
+
+
+def aplicar_migraciones(engine: Engine):
+
+    with engine.begin() as conexion:
+        version_actual = obtener_version_esquema(conexion)
+
+    aplicadas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= version_actual:
+            continue
+
+        # cada migracion va en su propia transaccion junto con el cambio de version
+        with engine.begin() as conexion:
+            migracion(conexion)
+            conexion.execute(version_esquema.update().values(version=version))
+
+        aplicadas.append(f"{version:03d} - {descripcion}")
+
+    return aplicadas
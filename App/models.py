@@ -1,10 +1,17 @@
-from sqlalchemy import Integer, String, Boolean, Date, Time, ForeignKey, UniqueConstraint
+from sqlalchemy import Integer, String, Boolean, Date, Time, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import date, time
+from typing import Optional
 
+from .config import ESTADO_CANCELADO
 from .database import Base
 
 
+# recurso de los turnos que no indican uno (y de los que existian antes de agregar recursos),
+# lo crea la migracion 004
+ID_RECURSO_GENERAL = 1
+
+
 class Persona(Base):
     __tablename__ = "personas"
 
@@ -23,8 +30,39 @@ class Persona(Base):
     # esta linea lo que hace es que relaciona turnos con personas
     turnos = relationship("Turno", back_populates="persona")
 
+
+class Recurso(Base):
+    # profesional, sala, etc.: cada recurso tiene su propia agenda, con un turno por horario
+    __tablename__ = "recursos"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    nombre: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    tipo: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    # los recursos inactivos no reciben turnos nuevos ni cuentan en la disponibilidad
+    activo: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+
+    turnos = relationship("Turno", back_populates="recurso")
+
+
 class Turno(Base):
     __tablename__ = "turnos"
+    # indices compuestos pensados para las consultas de crudTurnos:
+    # (fecha, estado, hora) cubre el calculo de turnos disponibles y los reportes por fecha/periodo,
+    # (persona_id, estado, fecha) cubre el conteo de cancelaciones y los reportes por persona.
+    # ux_turnos_recurso_fecha_hora_activos es un indice unico parcial: no puede haber dos turnos no cancelados
+    # del mismo recurso en la misma fecha y hora, asi la base rechaza la doble reserva aunque lleguen dos
+    # pedidos a la vez. Tambien es el indice de la disponibilidad por recurso.
+    # si se cambian, agregar tambien la migracion correspondiente en migraciones.py
+    __table_args__ = (
+        Index("ix_turnos_fecha_estado_hora_persona", "fecha", "estado", "hora", "persona_id"),
+        Index("ix_turnos_persona_estado_fecha", "persona_id", "estado", "fecha"),
+        Index(
+            "ux_turnos_recurso_fecha_hora_activos", "recurso_id", "fecha", "hora",
+            unique=True,
+            sqlite_where=text(f"estado != '{ESTADO_CANCELADO}'"),
+            postgresql_where=text(f"estado != '{ESTADO_CANCELADO}'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     #evita que se creen turnos con id's de personas inexistentes
@@ -33,6 +71,12 @@ class Turno(Base):
     # lo mismo que la otra linea pero en viceversa 
     persona = relationship("Persona", back_populates="turnos")
 
+    recurso_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("recursos.id"), nullable=False, default=ID_RECURSO_GENERAL,
+        server_default=text(str(ID_RECURSO_GENERAL))
+    )
+    recurso = relationship("Recurso", back_populates="turnos")
+
     fecha: Mapped[date] = mapped_column(Date, nullable=False)
     hora: Mapped[time] = mapped_column(Time, nullable=False)
     estado: Mapped[str] = mapped_column(String(20), nullable=False, default="pendiente")
@@ -0,0 +1,44 @@
+import io
+from datetime import datetime
+from borb.pdf import Document, Page, PDF, SingleColumnLayout, Paragraph, FixedColumnWidthTable
+
+
+# este modulo corre en los procesos del pool de PDFs, por eso solo importa borb y no la app
+
+FILAS_POR_TABLA = 20
+TAMANIO_LETRA = 8
+
+
+def _celda(texto: str, encabezado: bool = False):
+    return Paragraph(texto, font="Helvetica-Bold" if encabezado else "Helvetica", font_size=TAMANIO_LETRA,
+                     padding_top=2, padding_bottom=2, padding_left=2, padding_right=2)
+
+
+def renderizar_pdf(titulo: str, columnas: list, filas: list):
+    """Arma el PDF de un reporte (una tabla con las filas, partida en paginas) y devuelve los bytes."""
+    documento = Document()
+    pagina = Page()
+    documento.append_page(pagina)
+    layout = SingleColumnLayout(pagina)
+
+    layout.append_layout_element(Paragraph(titulo, font="Helvetica-Bold", font_size=14))
+    layout.append_layout_element(Paragraph(
+        f"Generado el {datetime.now():%Y-%m-%d %H:%M} - {len(filas)} filas", font_size=TAMANIO_LETRA, margin_bottom=6))
+
+    # borb no parte una tabla entre paginas, se arma una tabla (con encabezado) cada FILAS_POR_TABLA filas
+    # y el layout pasa a la pagina siguiente cuando no entra
+    for inicio in range(0, max(len(filas), 1), FILAS_POR_TABLA):
+        bloque = filas[inicio:inicio + FILAS_POR_TABLA]
+        tabla = FixedColumnWidthTable(number_of_rows=len(bloque) + 1, number_of_columns=len(columnas))
+
+        for columna in columnas:
+            tabla.append_layout_element(_celda(columna, encabezado=True))
+        for fila in bloque:
+            for valor in fila:
+                tabla.append_layout_element(_celda("" if valor is None else str(valor)))
+
+        layout.append_layout_element(tabla)
+
+    salida = io.BytesIO()
+    PDF.write(what=documento, where_to=salida)
+    return salida.getvalue()
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+from datetime import date
+from email.utils import formatdate
+
+from fastapi import Request, Response
+
+from .cache import CacheLRU
+from .config import CACHE_RESPUESTAS_MAX_ELEMENTOS, CACHE_RESPUESTAS_TTL_SEGUNDOS, CACHE_RESPUESTAS_MAX_BYTES
+from .versionDatos import version_datos, ultima_modificacion
+
+
+# Los listados y reportes que consultan los tableros cada pocos segundos. La respuesta JSON se guarda por
+# (ruta, parametros, version de los datos): mientras no haya escrituras se devuelve sin pasar por el endpoint,
+# y si el cliente manda If-None-Match con el ETag que ya tiene se responde 304 sin cuerpo.
+# El ETag es un hash del cuerpo, no de la version: con varios workers (cada uno con su contador) el mismo
+# contenido da el mismo ETag, y el TTL acota cuanto se sigue sirviendo una respuesta que cambio otro worker.
+RUTAS_CONDICIONALES = ("/turnos", "/personas")
+PREFIJO_REPORTES = "/reportes/"
+
+cache_respuestas = CacheLRU(CACHE_RESPUESTAS_MAX_ELEMENTOS, CACHE_RESPUESTAS_TTL_SEGUNDOS)
+
+_contadores = {"no_modificadas": 0, "desde_cache": 0, "generadas": 0}
+_lock_contadores = threading.Lock()
+
+
+def _contar(nombre: str):
+    with _lock_contadores:
+        _contadores[nombre] += 1
+
+
+def metricas_respuestas():
+    with _lock_contadores:
+        return {**_contadores, "en_cache": len(cache_respuestas)}
+
+
+def _es_condicional(request: Request):
+    if request.method != "GET":
+        return False
+
+    ruta = request.url.path
+    return ruta in RUTAS_CONDICIONALES or ruta.startswith(PREFIJO_REPORTES)
+
+
+def _coincide_etag(request: Request, etag: str):
+    si_no_coincide = request.headers.get("if-none-match")
+    if not si_no_coincide:
+        return False
+
+    etiquetas = [etiqueta.strip() for etiqueta in si_no_coincide.split(",")]
+    # comparacion debil: W/"x" y "x" son el mismo ETag para If-None-Match
+    return "*" in etiquetas or etag in (etiqueta.removeprefix("W/") for etiqueta in etiquetas)
+
+
+def _responder(request: Request, guardada: dict):
+    encabezados = {
+        **guardada["encabezados"],
+        "ETag": guardada["etag"],
+        "Last-Modified": guardada["modificado"],
+        # el cliente puede guardarla, pero tiene que revalidar con el ETag en cada pedido
+        "Cache-Control": "no-cache",
+    }
+
+    if _coincide_etag(request, guardada["etag"]):
+        _contar("no_modificadas")
+        return Response(status_code=304, headers=encabezados)
+
+    return Response(guardada["cuerpo"], headers=encabezados)
+
+
+async def respuestas_condicionales(request: Request, call_next):
+    """Middleware de ETag / Last-Modified y cache de respuestas para los listados y reportes en JSON"""
+    if not _es_condicional(request):
+        return await call_next(request)
+
+    # la version se lee antes de generar: si se escribe mientras tanto, la respuesta queda guardada con la
+    # version vieja y ya no se usa. La fecha va en la clave porque los reportes por defecto toman el mes actual
+    clave = (request.url.path, tuple(sorted(request.query_params.multi_items())), version_datos(), date.today())
+
+    guardada = cache_respuestas.obtener(clave)
+    if guardada is not None:
+        if not _coincide_etag(request, guardada["etag"]):
+            _contar("desde_cache")
+        return _responder(request, guardada)
+
+    modificado = ultima_modificacion()
+    respuesta = await call_next(request)
+    # los errores (404, 422, ...) y las exportaciones (csv y ndjson en streaming, pdf con su propia cache)
+    # se devuelven como vinieron, sin ETag y sin leer el cuerpo
+    tipo = respuesta.headers.get("content-type", "")
+    if respuesta.status_code != 200 or not tipo.startswith("application/json"):
+        return respuesta
+
+    cuerpo = b"".join([parte async for parte in respuesta.body_iterator])
+    guardada = {
+        "cuerpo": cuerpo,
+        # los encabezados del endpoint (content-type, content-disposition, ...), el largo lo vuelve a poner Response
+        "encabezados": {clave: valor for clave, valor in respuesta.headers.items() if clave != "content-length"},
+        "etag": f'"{hashlib.blake2b(cuerpo, digest_size=16).hexdigest()}"',
+        "modificado": formatdate(modificado, usegmt=True),
+    }
+    _contar("generadas")
+
+    # las respuestas muy grandes (reportes completos) no se guardan, pero igual llevan ETag
+    if len(cuerpo) <= CACHE_RESPUESTAS_MAX_BYTES:
+        cache_respuestas.guardar(clave, guardada)
+
+    return _responder(request, guardada)
@@ -1,8 +1,9 @@
 from datetime import date, time
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, computed_field
+from typing import List, Optional
 
 from .config import ESTADO_PENDIENTE
+from .utils import calcular_edad
 
 
 # Validación de Turnos (Ingreso de datos)
@@ -11,10 +12,107 @@ class turno_base(BaseModel):
     fecha: date
     hora: time
     estado: Optional[str] = ESTADO_PENDIENTE
+    # sin recurso el turno va al recurso general
+    recurso_id: Optional[int] = None
 
 
 class actualizar_turno_base(BaseModel):
     fecha: Optional[date] = None
     hora: Optional[time] = None
     estado: Optional[str] = None
+    recurso_id: Optional[int] = None
 
+
+# Cambio de estado de muchos turnos a la vez (confirmado, cancelado o asistido)
+class cambio_estado_turnos(BaseModel):
+    ids: List[int]
+    estado: str
+
+
+class resultado_cambio_estado(BaseModel):
+    id: int
+    ok: bool
+    estado: Optional[str] = None
+    error: Optional[str] = None
+
+
+class respuesta_cambio_estado(BaseModel):
+    modificados: int
+    resultados: List[resultado_cambio_estado]
+
+
+# Recursos (profesionales, salas): cada uno tiene su propia agenda
+class recurso_base(BaseModel):
+    nombre: str
+    tipo: Optional[str] = None
+
+
+class actualizar_recurso_base(BaseModel):
+    nombre: Optional[str] = None
+    tipo: Optional[str] = None
+    activo: Optional[bool] = None
+
+
+# Respuestas de los listados: se arman directo desde las filas de columnas de la consulta
+# (from_attributes) y FastAPI las serializa a JSON con pydantic, sin armar un dict por fila
+class turno_respuesta(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    persona_id: int
+    recurso_id: int
+    fecha: date
+    hora: time
+    estado: str
+
+
+class recurso_respuesta(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    nombre: str
+    tipo: Optional[str] = None
+    activo: bool
+
+
+class listado_turnos(BaseModel):
+    turnos: List[turno_respuesta]
+    siguiente_cursor: Optional[str] = None
+
+
+class persona_respuesta(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    nombre: str
+    email: str
+    dni: str
+    telefono: str
+    fecha_nacimiento: date
+    habilitado: bool
+
+    @computed_field
+    @property
+    def edad(self) -> int:
+        return calcular_edad(self.fecha_nacimiento)
+
+
+class listado_personas(BaseModel):
+    personas: List[persona_respuesta]
+    siguiente_cursor: Optional[str] = None
+
+
+class persona_estado(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    nombre: str
+    dni: str
+    email: str
+    habilitado: bool
+
+
+class reporte_estado_personas(BaseModel):
+    estado: str
+    cantidad: int
+    personas: List[persona_estado]
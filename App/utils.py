@@ -1,13 +1,22 @@
+import base64
+import json
+from contextlib import contextmanager
 from sqlalchemy import event
 from datetime import date
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+import email_validator
 from email_validator import validate_email, EmailNotValidError
+from email_validator.deliverability import validate_email_deliverability
 
-from .config import ESTADO_ASISTIDO, ESTADO_CANCELADO, MAX_EDAD_PERMITIDA
-from .database import SesionLocal, engine
+from .config import ESTADO_ASISTIDO, ESTADO_CANCELADO, MAX_EDAD_PERMITIDA, USAR_SESION_ASYNC, LIMITE_LISTADO_MAX
+from .database import SesionLocal, SesionAsyncLocal, engine
 
 #Acceder a la base de datos
-def get_db():
+# toda sesion se abre con este context manager (o con las dependencias de abajo) para que siempre
+# se cierre y la conexion vuelva al pool, nunca con next(get_db())
+@contextmanager
+def sesion_db():
     db = SesionLocal()
     try:
         yield db
@@ -15,6 +24,37 @@ def get_db():
         db.close()
 
 
+def get_db():
+    with sesion_db() as db:
+        yield db
+
+
+async def get_db_async():
+    async with SesionAsyncLocal() as db:
+        yield db
+
+
+# dependencia que usan los endpoints, segun USAR_SESION_ASYNC da una Session o una AsyncSession
+get_sesion = get_db_async if USAR_SESION_ASYNC else get_db
+
+
+async def ejecutar(db, funcion, *args):
+    # version async de cualquier funcion de los crud: las funciones reciben siempre una Session sync.
+    # con AsyncSession se corren con run_sync (la E/S de la base se espera en el event loop sin bloquearlo),
+    # con Session sync se corren en el threadpool como los endpoints def
+    if USAR_SESION_ASYNC:
+        return await db.run_sync(funcion, *args)
+
+    return await run_in_threadpool(funcion, db, *args)
+
+
+async def normalizar_email(datos: dict):
+    # validar_email consulta el DNS del dominio y puede tardar segundos: se corre en el threadpool antes de
+    # ejecutar(), porque con AsyncSession las funciones de los crud corren en el event loop (run_sync)
+    if "email" in datos:
+        datos["email"] = await run_in_threadpool(validar_email, datos["email"])
+
+
 def validar_fecha_pasada(fecha_turno: date):
 
     fecha_actual = date.today()
@@ -25,28 +65,48 @@ def validar_fecha_pasada(fecha_turno: date):
         )
     
 
-def validar_email(email: str):
+def validar_email(email: str, dominios_verificados: dict = None):
+    # dominios_verificados: en las cargas masivas se consulta el DNS una sola vez por dominio
+    # (dominio -> None si acepta mails, o el error que dio), en lugar de una vez por fila
     try:
-        valid_email = validate_email(email)
-        return valid_email.email  
+        if dominios_verificados is None:
+            return validate_email(email).email
+
+        valid_email = validate_email(email, check_deliverability=False)
+        if email_validator.CHECK_DELIVERABILITY:
+            if valid_email.ascii_domain not in dominios_verificados:
+                try:
+                    validate_email_deliverability(valid_email.ascii_domain, valid_email.domain)
+                    dominios_verificados[valid_email.ascii_domain] = None
+                except EmailNotValidError as e:
+                    dominios_verificados[valid_email.ascii_domain] = e
+
+            error_dominio = dominios_verificados[valid_email.ascii_domain]
+            if error_dominio is not None:
+                raise error_dominio
+
+        return valid_email.email
     except EmailNotValidError as e:
+        raise error_email(e)
+
 
-#los errores por default estan en ingles, aca cambio el idioma
-        error_msg = str(e).lower()
-        if "must have an @-sign" in error_msg:
-            raise HTTPException(status_code=400, detail="email invalido: El email debe tener un simbolo @")
-        elif "must be something after the @-sign" in error_msg:
-            raise HTTPException(status_code=400, detail="email invalido: Debe haber algo despues del simbolo @")
-        elif "domain" in error_msg and "invalid" in error_msg:
-            raise HTTPException(status_code=400, detail="email invalido: El dominio del email no es valido")
-        elif "local part" in error_msg:
-            raise HTTPException(status_code=400, detail="email invalido: La parte local del email (antes del @) no es valida")
-        elif "too long" in error_msg:
-            raise HTTPException(status_code=400, detail="email invalido: El email es demasiado largo")
-        elif "empty" in error_msg:
-            raise HTTPException(status_code=400, detail="email invalido: El email no puede estar vacio")
-        else:
-            raise HTTPException(status_code=400, detail=f"email invalido: {str(e)}")
+def error_email(e: EmailNotValidError):
+    # los errores por default estan en ingles, aca cambio el idioma
+    error_msg = str(e).lower()
+    if "must have an @-sign" in error_msg:
+        return HTTPException(status_code=400, detail="email invalido: El email debe tener un simbolo @")
+    elif "must be something after the @-sign" in error_msg:
+        return HTTPException(status_code=400, detail="email invalido: Debe haber algo despues del simbolo @")
+    elif "domain" in error_msg and "invalid" in error_msg:
+        return HTTPException(status_code=400, detail="email invalido: El dominio del email no es valido")
+    elif "local part" in error_msg:
+        return HTTPException(status_code=400, detail="email invalido: La parte local del email (antes del @) no es valida")
+    elif "too long" in error_msg:
+        return HTTPException(status_code=400, detail="email invalido: El email es demasiado largo")
+    elif "empty" in error_msg:
+        return HTTPException(status_code=400, detail="email invalido: El email no puede estar vacio")
+    else:
+        return HTTPException(status_code=400, detail=f"email invalido: {str(e)}")
 
 def calcular_edad(fecha_nacimiento: date):
     hoy = date.today()
@@ -80,4 +140,35 @@ def validar_turno_modificable(turno):
         raise HTTPException(
             status_code=400,
             detail=f"No se puede modificar un turno {turno.estado}"
-        )
\ No newline at end of file
+        )
+
+
+def en_lotes(elementos: list, tamanio: int):
+    # para los IN (...) y los insert masivos: SQLite limita la cantidad de parametros por sentencia
+    for inicio in range(0, len(elementos), tamanio):
+        yield elementos[inicio:inicio + tamanio]
+
+
+# Paginacion por cursor (keyset): el cliente recibe un token opaco con los valores de la ultima fila
+# de la pagina y lo devuelve para pedir la siguiente
+def codificar_cursor(*valores):
+    texto = json.dumps([str(valor) for valor in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, *conversores):
+    # conversores: una funcion por valor para recuperar el tipo (int, date.fromisoformat, ...)
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(conversores):
+            raise ValueError(cursor)
+
+        return [convertir(valor) for convertir, valor in zip(conversores, valores)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+
+
+def validar_limite(limite: int):
+    if limite < 1 or limite > LIMITE_LISTADO_MAX:
+        raise HTTPException(status_code=400, detail=f"El limite debe estar entre 1 y {LIMITE_LISTADO_MAX}")
@@ -0,0 +1,52 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+# contador que sube con cada commit que escribio algo (por el ORM o con insert/update/delete ejecutados
+# desde la sesion). Sirve como clave de las caches de respuestas: si cambia la version, se vuelve a generar.
+# Es del proceso, con varios workers cada uno ve solo sus propias escrituras (las caches que la usan tienen TTL).
+_version = 0
+# momento (epoch) de la ultima escritura vista por este proceso, al arrancar se toma el inicio
+_modificado = time.time()
+_lock = threading.Lock()
+
+
+def version_datos():
+    return _version
+
+
+def ultima_modificacion():
+    return _modificado
+
+
+def incrementar_version_datos():
+    global _version, _modificado
+
+    with _lock:
+        _version += 1
+        _modificado = time.time()
+
+
+@event.listens_for(Session, "after_flush")
+def _despues_de_flush(sesion, contexto_flush):
+    if sesion.new or sesion.dirty or sesion.deleted:
+        sesion.info["escribio"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _al_ejecutar(estado_ejecucion):
+    if estado_ejecucion.is_insert or estado_ejecucion.is_update or estado_ejecucion.is_delete:
+        estado_ejecucion.session.info["escribio"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_de_commit(sesion):
+    if sesion.info.pop("escribio", False):
+        incrementar_version_datos()
+
+
+@event.listens_for(Session, "after_rollback")
+def _despues_de_rollback(sesion):
+    sesion.info.pop("escribio", None)
@@ -0,0 +1,99 @@
+"""Compara el throughput de escritura de SQLite con y sin los PRAGMAs del .env.
+
+Simula reservas concurrentes: varios procesos (como workers de uvicorn) insertan turnos
+con un commit por reserva sobre la misma base.
+
+Uso (desde la raiz del repo):
+    python -m benchmarks.bench_pragmas_sqlite --procesos 4 --reservas 500
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, time as hora, timedelta
+from multiprocessing import Pool
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from App.database import Base, PRAGMAS_SQLITE, registrar_pragmas_sqlite
+from App.migraciones import aplicar_migraciones
+from App.models import Persona, Turno
+
+
+ESCENARIOS = {
+    # valores por defecto de SQLite: journal en modo rollback y fsync completo en cada commit
+    "por_defecto": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "pragmas_env": PRAGMAS_SQLITE,
+}
+
+
+def crear_base(url: str, pragmas: dict):
+    engine = create_engine(url)
+    registrar_pragmas_sqlite(engine, pragmas)
+    Base.metadata.create_all(engine)
+    # la migracion de recursos crea el recurso general de los turnos
+    aplicar_migraciones(engine)
+
+    with Session(engine) as db:
+        db.add(Persona(nombre="bench", email="bench@bench.com", dni="0", telefono="0",
+                       fecha_nacimiento=date(1990, 1, 1), habilitado=True))
+        db.commit()
+
+    engine.dispose()
+
+
+def reservar(args):
+    url, pragmas, numero_proceso, reservas = args
+
+    engine = create_engine(url)
+    registrar_pragmas_sqlite(engine, pragmas)
+
+    errores = 0
+    inicio = time.perf_counter()
+    for i in range(reservas):
+        # cada reserva en un horario distinto para medir solo el costo de escritura
+        indice = numero_proceso * reservas + i
+        turno = Turno(persona_id=1, fecha=date(2030, 1, 1) + timedelta(days=indice // 96),
+                      hora=hora(indice % 96 // 4, indice % 4 * 15), estado="pendiente")
+        try:
+            with Session(engine) as db:
+                db.add(turno)
+                db.commit()
+        except OperationalError:
+            errores += 1
+
+    duracion = time.perf_counter() - inicio
+    engine.dispose()
+    return duracion, errores
+
+
+def correr_escenario(nombre: str, pragmas: dict, procesos: int, reservas: int):
+    with tempfile.TemporaryDirectory() as directorio:
+        url = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+        crear_base(url, pragmas)
+
+        inicio = time.perf_counter()
+        with Pool(procesos) as pool:
+            resultados = pool.map(reservar, [(url, pragmas, n, reservas) for n in range(procesos)])
+        duracion = time.perf_counter() - inicio
+
+    total = procesos * reservas
+    errores = sum(errores for _, errores in resultados)
+    print(f"{nombre:>12}: {total} reservas en {duracion:.2f}s -> {(total - errores) / duracion:.0f} reservas/s, "
+          f"{errores} errores 'database is locked'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--reservas", type=int, default=500, help="reservas por proceso")
+    args = parser.parse_args()
+
+    for nombre, pragmas in ESCENARIOS.items():
+        correr_escenario(nombre, pragmas, args.procesos, args.reservas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Latencia por reserva de crear_turno (validaciones + insert + commit) y sentencias SQL por reserva.
+
+Cada reserva usa su propia sesion, como un request. Se informan los percentiles de latencia y se
+compara el p95 con el objetivo (--objetivo-ms).
+
+Uso (desde la raiz del repo):
+    python -m benchmarks.bench_reservas --personas 200 --reservas 2000 --objetivo-ms 2
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def percentil(valores: list, p: float):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--personas", type=int, default=200)
+    parser.add_argument("--reservas", type=int, default=2000)
+    parser.add_argument("--objetivo-ms", type=float, default=2.0, help="latencia p95 esperada por reserva")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # la configuracion se lee al importar App, la base se elige antes
+        os.environ["URL_BASE_DATOS"] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+
+        from sqlalchemy import event, insert
+        from App.crudTurnos import crear_turno
+        from App.database import Base, engine
+        from App.grilla import GRILLA
+        from App.migraciones import aplicar_migraciones
+        from App.models import Persona
+        from App.schemas import turno_base
+        from App.utils import sesion_db
+
+        Base.metadata.create_all(engine)
+        aplicar_migraciones(engine)
+        with engine.begin() as conexion:
+            conexion.execute(insert(Persona), [
+                {"nombre": f"Persona {i}", "email": f"persona{i}@bench.com", "dni": str(i), "telefono": str(i),
+                 "fecha_nacimiento": date(1990, 1, 1), "habilitado": True}
+                for i in range(args.personas)
+            ])
+
+        sentencias = 0
+
+        def contar(*_):
+            nonlocal sentencias
+            sentencias += 1
+
+        event.listen(engine, "before_cursor_execute", contar)
+
+        def horarios(fecha):
+            # los horarios habilitados de cada dia desde mañana (saltea feriados y dias sin atencion)
+            while True:
+                for hora in GRILLA.horarios_del_dia(fecha):
+                    yield fecha, hora
+                fecha += timedelta(days=1)
+
+        latencias = []
+        for i, (fecha, hora) in zip(range(args.reservas), horarios(date.today() + timedelta(days=1))):
+            datos = turno_base(persona_id=i % args.personas + 1, fecha=fecha, hora=hora)
+            inicio = time.perf_counter()
+            with sesion_db() as db:
+                crear_turno(db, datos)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    p95 = percentil(latencias, 0.95)
+    print(f"{args.reservas} reservas: p50 {statistics.median(latencias):.3f} ms, p95 {p95:.3f} ms, "
+          f"p99 {percentil(latencias, 0.99):.3f} ms, {sentencias / args.reservas:.2f} sentencias por reserva")
+    print(f"objetivo p95 <= {args.objetivo_ms} ms: {'cumplido' if p95 <= args.objetivo_ms else 'NO cumplido'}")
+
+
+if __name__ == "__main__":
+    main()
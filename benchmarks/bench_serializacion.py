@@ -0,0 +1,94 @@
+"""Mide filas por segundo de los listados de la API (consulta + serializacion de la respuesta).
+
+Arma una base temporal con personas y turnos, y recorre /turnos y /personas pagina por pagina
+(con el limite maximo) y /reportes/estado-personas completo, en el mismo proceso con TestClient.
+
+Uso (desde la raiz del repo):
+    python -m benchmarks.bench_serializacion --personas 20000 --turnos 50000 --repeticiones 3
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, time as hora, timedelta
+
+
+def crear_base(url: str, personas: int, turnos: int):
+    from sqlalchemy import create_engine, insert
+    from App.database import Base
+    from App.migraciones import aplicar_migraciones
+    from App.models import Persona, Turno
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    aplicar_migraciones(engine)
+
+    with engine.begin() as conexion:
+        conexion.execute(insert(Persona), [
+            {"nombre": f"Persona {i}", "email": f"persona{i}@bench.com", "dni": str(10000000 + i),
+             "telefono": str(1100000000 + i), "fecha_nacimiento": date(1980, 1, 1) + timedelta(days=i % 10000),
+             "habilitado": i % 10 != 0}
+            for i in range(personas)
+        ])
+        # un turno por horario (cada 15 minutos), para respetar el indice unico
+        conexion.execute(insert(Turno), [
+            {"persona_id": i % personas + 1, "fecha": date(2030, 1, 1) + timedelta(days=i // 96),
+             "hora": hora(i % 96 // 4, i % 4 * 15), "estado": "pendiente"}
+            for i in range(turnos)
+        ])
+
+    engine.dispose()
+
+
+def recorrer_paginas(cliente, url: str, clave: str, limite: int):
+    filas = 0
+    params = {"limite": limite}
+    while True:
+        datos = cliente.get(url, params=params).json()
+        filas += len(datos[clave])
+        if datos["siguiente_cursor"] is None:
+            return filas
+        params["cursor"] = datos["siguiente_cursor"]
+
+
+def medir(nombre: str, funcion, repeticiones: int):
+    from App.respuestasCondicionales import cache_respuestas
+
+    mejor = None
+    for _ in range(repeticiones):
+        # sin escrituras en el medio las repeticiones saldrian de la cache de respuestas
+        cache_respuestas.limpiar()
+        inicio = time.perf_counter()
+        filas = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+
+    print(f"{nombre:>26}: {filas} filas en {mejor:.3f}s -> {filas / mejor:,.0f} filas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--personas", type=int, default=20000)
+    parser.add_argument("--turnos", type=int, default=50000)
+    parser.add_argument("--repeticiones", type=int, default=3, help="se informa la mejor")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # la configuracion se lee al importar App, la base se elige antes
+        os.environ["URL_BASE_DATOS"] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+        crear_base(os.environ["URL_BASE_DATOS"], args.personas, args.turnos)
+
+        from fastapi.testclient import TestClient
+        from App.config import LIMITE_LISTADO_MAX
+        from App.main import app
+
+        with TestClient(app) as cliente:
+            medir("/turnos", lambda: recorrer_paginas(cliente, "/turnos", "turnos", LIMITE_LISTADO_MAX), args.repeticiones)
+            medir("/personas", lambda: recorrer_paginas(cliente, "/personas", "personas", LIMITE_LISTADO_MAX), args.repeticiones)
+            medir("/reportes/estado-personas", lambda: len(
+                cliente.get("/reportes/estado-personas", params={"habilitada": True}).json()["personas"]
+            ), args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()